@@ -1,8 +1,14 @@
 import os
 import time
-import json
+import hmac
+import uuid
+import shutil
+import sqlite3
 import logging
-from flask import Flask, request, redirect, session, jsonify, send_from_directory
+import zipfile
+import tempfile
+import threading
+from flask import Flask, request, redirect, session, jsonify, send_from_directory, g, Response
 from flask_session import Session
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -12,27 +18,47 @@ from werkzeug.utils import secure_filename
 from msal import SerializableTokenCache
 from msal_auth import load_token_cache, save_token_cache, build_msal_app
 from graph_api import (
-    search_all_files,
     check_file_access,
     send_notification_email,
     send_multiple_file_email,
 )
-from openai_api import detect_intent_and_extract, answer_general_query
+from openai_api import answer_general_query
 from db import (
     init_db,
     save_message,
     get_user_chats,
     get_chat_messages,
-    delete_old_messages,
     delete_old_chats,
+    search_messages,
 )
-from hr_router import handle_query
+from chat_pipeline import ChatTurn, run_in_background
+from llm_gateway import LLMBusy, BUSY_REPLY
+from search_cache import search_cache
 from knowledge_base.build_index import build_index
+from hr_documents import (
+    DOCS_DIR,
+    METADATA_PATH,
+    ALLOWED_EXTS,
+    UploadTooLarge,
+    load_metadata,
+    metadata_transaction,
+    indexed_hashes,
+    file_sha256,
+    stream_to_file,
+)
+import metrics
+import profiler
+import static_assets
 
 # 🌱 Load env and init logging
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
+# 📦 Bulk upload limits
+HR_UPLOAD_MAX_FILE_MB = int(os.getenv("HR_UPLOAD_MAX_FILE_MB", "25"))
+HR_UPLOAD_MAX_BATCH_MB = int(os.getenv("HR_UPLOAD_MAX_BATCH_MB", "500"))
+HR_UPLOAD_MAX_FILES = int(os.getenv("HR_UPLOAD_MAX_FILES", "500"))
+
 # 🚀 App setup
 app = Flask(__name__, static_folder="./frontend/dist", static_url_path="/")
 app.secret_key = os.getenv("CLIENT_SECRET")
@@ -43,9 +69,100 @@ app.config["SESSION_TYPE"] = "filesystem"
 app.config["SESSION_PERMANENT"] = True
 app.permanent_session_lifetime = timedelta(hours=1)
 Session(app)
+# Public frontend assets are served ahead of Flask (no session, precompressed)
+static_assets.install(app)
 
 init_db()
 
+# 📊 Request metrics
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    metrics.HTTP_SECONDS.observe(
+        elapsed,
+        endpoint=request.endpoint or "unmatched",
+        method=request.method,
+        status=response.status_code,
+    )
+    if request.endpoint == "chat":
+        body = response.get_json(silent=True) or {}
+        intent = body.get("intent") or ("selection" if body.get("files") else "none")
+        outcome = "error" if response.status_code >= 500 or intent in ("error", "session_expired") else "ok"
+        metrics.CHAT_SECONDS.observe(elapsed, intent=intent, outcome=outcome)
+    return response
+
+# Scrapes need METRICS_TOKEN; METRICS_PUBLIC=1 opens the endpoint (only behind an internal-only listener)
+@app.route("/metrics")
+def metrics_endpoint():
+    expected = os.getenv("METRICS_TOKEN")
+    if not expected:
+        if os.getenv("METRICS_PUBLIC", "0") != "1":
+            return Response("Metrics are disabled: set METRICS_TOKEN\n", status=404, mimetype="text/plain")
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {expected}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# 🔬 On-demand profiling (X-Profile: 1 from an HR admin, or PROFILE_SAMPLE_RATE)
+@app.before_request
+def start_profiler():
+    if request.endpoint not in profiler.PROFILE_ENDPOINTS:
+        return
+    admin = is_hr_admin(session.get("user_email"))
+    if not profiler.should_profile(request.headers.get("X-Profile"), admin):
+        return
+    # Admins may tag a profile with their request id; the unique suffix keeps ids from being reused
+    incoming = request.headers.get("X-Request-ID", "")[:40]
+    prefix = incoming if admin and profiler.is_valid_profile_id(incoming) else str(int(time.time()))
+    g.profile_id = f"{prefix}-{uuid.uuid4().hex[:12]}"
+    g.profiler = profiler.StackSampler(threading.get_ident()).start()
+
+@app.after_request
+def stop_profiler(response):
+    sampler = g.pop("profiler", None)
+    if sampler is None:
+        return response
+    sampler.stop()
+    try:
+        profiler.save_profile(g.profile_id, sampler, {
+            "endpoint": request.endpoint,
+            "user": session.get("user_email"),
+            "status": response.status_code,
+        })
+        response.headers["X-Profile-Id"] = g.profile_id
+    except Exception as e:
+        logging.warning(f"⚠️ Failed to save profile: {e}")
+    return response
+
+@app.teardown_request
+def discard_profiler(exc):
+    sampler = g.pop("profiler", None)
+    if sampler is not None:
+        sampler.stop()
+
+@app.route("/api/profiles")
+def api_profiles():
+    if not is_hr_admin(session.get("user_email")):
+        return jsonify({"error": "❌ Unauthorized"}), 403
+    return jsonify({"profiles": profiler.list_profiles()})
+
+@app.route("/api/profiles/<profile_id>")
+def download_profile(profile_id):
+    if not is_hr_admin(session.get("user_email")):
+        return jsonify({"error": "❌ Unauthorized"}), 403
+    if not profiler.is_valid_profile_id(profile_id):
+        return jsonify({"error": "Invalid profile id"}), 400
+    fname = f"{profile_id}.folded"
+    if not os.path.exists(os.path.join(profiler.PROFILE_DIR, fname)):
+        return jsonify({"error": "Profile not found"}), 404
+    return send_from_directory(profiler.PROFILE_DIR, fname, as_attachment=True, mimetype="text/plain")
+
 # ✅ Check HR/Admin
 def is_hr_admin(user_email):
     allowed_emails = os.getenv("HR_ADMIN_EMAILS", "")
@@ -86,6 +203,8 @@ def authorized():
     session["stage"] = "start"
     session["found_files"] = []
     save_token_cache(session["account_id"], cache)
+    # A fresh login may carry different permissions; don't serve results from the old token
+    search_cache.invalidate_user(session["user_email"])
 
     return redirect("/")
 
@@ -102,16 +221,8 @@ def check_login():
 # 📚 Document APIs
 @app.route("/api/hr_documents")
 def hr_documents():
-    docs_path = os.path.join("knowledge_base", "documents")
-    metadata_path = os.path.join("knowledge_base", "index_metadata.json")
-    metadata = {}
-
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, "r") as f:
-                metadata = json.load(f)
-        except Exception:
-            metadata = {}
+    docs_path = DOCS_DIR
+    metadata = load_metadata()
 
     files = []
     if os.path.exists(docs_path):
@@ -146,28 +257,19 @@ def upload_hr_doc():
     if not filename.lower().endswith(allowed_exts):
         return jsonify({"error": "Unsupported format"}), 400
 
-    save_path = os.path.join("knowledge_base", "documents", filename)
+    save_path = os.path.join(DOCS_DIR, filename)
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     file.save(save_path)
 
     # Store uploader info
-    metadata_path = os.path.join("knowledge_base", "index_metadata.json")
-    metadata = {}
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, "r") as f:
-                metadata = json.load(f)
-        except Exception:
-            metadata = {}
-
-    metadata[filename] = {
-        "uploader": user_email,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-    }
-
     try:
-        with open(metadata_path, "w") as f:
-            json.dump(metadata, f, indent=2)
+        digest = file_sha256(save_path)
+        with metadata_transaction() as metadata:
+            metadata[filename] = {
+                "uploader": user_email,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "sha256": digest,
+            }
     except Exception as e:
         logging.warning(f"⚠️ Failed to write metadata: {e}")
 
@@ -177,6 +279,116 @@ def upload_hr_doc():
     except Exception as e:
         return jsonify({"error": f"❌ Indexing failed: {e}"}), 500
 
+def iter_bulk_uploads():
+    """Yield (filename, open_fn) for every uploaded file, expanding ZIP archives."""
+    for upload in request.files.getlist("files") + request.files.getlist("file"):
+        if not upload.filename:
+            continue
+        if not upload.filename.lower().endswith(".zip"):
+            yield upload.filename, lambda upload=upload: upload.stream
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.stream)
+        except zipfile.BadZipFile:
+            yield upload.filename, None
+            continue
+        with archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or info.filename.startswith("__MACOSX/"):
+                    continue
+                yield name, lambda info=info, archive=archive: archive.open(info)
+
+@app.route("/upload_hr_docs", methods=["POST"])
+def upload_hr_docs():
+    """Upload many documents (or ZIPs of documents) and reindex once for the whole batch."""
+    user_email = session.get("user_email")
+    if not is_hr_admin(user_email):
+        return jsonify({"error": "❌ Unauthorized"}), 403
+
+    mb = 1024 * 1024
+    if request.content_length and request.content_length > HR_UPLOAD_MAX_BATCH_MB * mb:
+        return jsonify({"error": f"❌ Upload larger than {HR_UPLOAD_MAX_BATCH_MB} MB"}), 413
+
+    added, skipped, failed = [], [], []
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".upload-", dir=os.path.dirname(DOCS_DIR))
+    try:
+        # 1️⃣ Stream and hash every file into staging without the metadata lock
+        staged = {}
+        batch_hashes = {}
+        batch_bytes = 0
+        for original_name, open_fn in iter_bulk_uploads():
+            filename = secure_filename(original_name)
+            if open_fn is None:
+                failed.append({"name": original_name, "reason": "Invalid ZIP archive"})
+                continue
+            if len(staged) + len(skipped) + len(failed) >= HR_UPLOAD_MAX_FILES:
+                failed.append({"name": original_name, "reason": f"More than {HR_UPLOAD_MAX_FILES} files"})
+                continue
+            if not filename.lower().endswith(ALLOWED_EXTS):
+                failed.append({"name": original_name, "reason": "Unsupported format"})
+                continue
+            if filename in staged:
+                failed.append({"name": original_name, "reason": "Duplicate filename in upload"})
+                continue
+
+            tmp_path = os.path.join(staging, filename)
+            limit = min(HR_UPLOAD_MAX_FILE_MB * mb, HR_UPLOAD_MAX_BATCH_MB * mb - batch_bytes)
+            try:
+                with open_fn() as src:
+                    digest, size = stream_to_file(src, tmp_path, limit)
+            except UploadTooLarge:
+                if limit < HR_UPLOAD_MAX_FILE_MB * mb:
+                    reason = f"Upload exceeds {HR_UPLOAD_MAX_BATCH_MB} MB in total"
+                else:
+                    reason = f"File larger than {HR_UPLOAD_MAX_FILE_MB} MB"
+                failed.append({"name": original_name, "reason": reason})
+                continue
+            except Exception as e:
+                failed.append({"name": original_name, "reason": f"Could not read file: {e}"})
+                continue
+
+            batch_bytes += size
+            if digest in batch_hashes:
+                os.remove(tmp_path)
+                skipped.append({"name": filename, "reason": f"Same content as '{batch_hashes[digest]}'"})
+                continue
+            batch_hashes[digest] = filename
+            staged[filename] = (tmp_path, digest)
+
+        # 2️⃣ Lock only to check against the indexed documents and commit the metadata
+        if staged:
+            with metadata_transaction() as metadata:
+                known = indexed_hashes(metadata)
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+                for filename, (tmp_path, digest) in staged.items():
+                    if digest in known:
+                        skipped.append({"name": filename, "reason": f"Same content as '{known[digest]}'"})
+                        continue
+                    os.replace(tmp_path, os.path.join(DOCS_DIR, filename))
+                    metadata[filename] = {"uploader": user_email, "timestamp": timestamp, "sha256": digest}
+                    known[digest] = filename
+                    added.append(filename)
+    except Exception as e:
+        logging.exception("❌ Bulk upload failed:")
+        return jsonify({"error": f"❌ Upload failed: {e}", "added": added, "skipped": skipped, "failed": failed}), 500
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    summary = {"added": added, "skipped": skipped, "failed": failed}
+    if not added:
+        summary["message"] = f"ℹ️ Nothing new to index ({len(skipped)} skipped, {len(failed)} failed)."
+        return jsonify(summary)
+
+    try:
+        build_index()
+    except Exception as e:
+        summary["error"] = f"❌ Indexing failed: {e}"
+        return jsonify(summary), 500
+    summary["message"] = f"✅ {len(added)} added, {len(skipped)} skipped, {len(failed)} failed. Index updated."
+    return jsonify(summary)
+
 # 🔄 Chat session APIs
 @app.route("/api/session_state")
 def session_state():
@@ -212,10 +424,23 @@ def get_messages(chat_id):
         "messages": [{"sender": m[0], "message": m[1], "timestamp": m[2]} for m in messages]
     })
 
+@app.route("/api/search")
+def search_chats():
+    user_email = session.get("user_email")
+    if not user_email:
+        return jsonify({"error": "Unauthorized"}), 401
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 20, type=int)
+    try:
+        return jsonify({"query": query, "results": search_messages(user_email, query, limit)})
+    except sqlite3.OperationalError as e:
+        logging.error(f"❌ Chat search failed: {e}")
+        return jsonify({"error": "❌ Chat search is unavailable"}), 503
+
 @app.route("/chat", methods=["POST"])
 def chat():
-    delete_old_messages(days=3)
-    delete_old_chats(session.get("user_email"))
+    # Retention runs off the request path (delete_old_chats also enforces the 3-day message limit)
+    run_in_background(delete_old_chats, session.get("user_email"))
 
     user_input = request.json.get("message", "").strip()
     is_selection = request.json.get("selectionStage", False)
@@ -225,16 +450,38 @@ def chat():
     session["chat_id"] = chat_id
     user_email = session.get("user_email")
 
-    cache = load_token_cache(account_id)
-    app_msal = build_msal_app(cache)
-    token = None
-    accounts = app_msal.get_accounts()
-    if accounts:
-        result = app_msal.acquire_token_silent(os.getenv("SCOPE").split(), account=accounts[0])
-        if "access_token" in result:
-            token = result["access_token"]
-            session["token"] = token
-            save_token_cache(account_id, cache)
+    # Start the LLM stages now; they don't need the Graph token
+    stage = session.get("stage")
+    selecting = bool(is_selection and selected_indices) or (
+        stage == "awaiting_selection" and is_number_selection(user_input)
+    )
+    # Only spend LLM calls ahead of the session checks in chat_turn() for a logged-in session
+    turn = ChatTurn(
+        user_input,
+        expects_file_query=stage == "awaiting_query" and not selecting,
+        speculate=bool(user_email and chat_id),
+    )
+    try:
+        return chat_turn(turn, user_input, is_selection, selected_indices, account_id, chat_id, user_email)
+    except LLMBusy as e:
+        # e.g. classify_intent or the HR answer could not get an LLM slot; same reply as a failed general answer
+        logging.warning(f"⚠️ LLM busy during /chat: {e}")
+        return jsonify(response=BUSY_REPLY, intent="error")
+    finally:
+        turn.close()
+
+def chat_turn(turn, user_input, is_selection, selected_indices, account_id, chat_id, user_email):
+    with metrics.timer("token_refresh"):
+        cache = load_token_cache(account_id)
+        app_msal = build_msal_app(cache)
+        token = None
+        accounts = app_msal.get_accounts()
+        if accounts:
+            result = app_msal.acquire_token_silent(os.getenv("SCOPE").split(), account=accounts[0])
+            if "access_token" in result:
+                token = result["access_token"]
+                session["token"] = token
+                save_token_cache(account_id, cache)
 
     if not token:
         session.clear()
@@ -243,44 +490,50 @@ def chat():
     if not user_email or not chat_id:
         return jsonify(response="❌ Missing session", intent="error")
 
+    turn.set_token(token, user_email, account_id)
     if user_input:
-        save_message(user_email, chat_id, user_message=user_input)
+        turn.save_user_message(user_email, chat_id)
 
-    hr_response = handle_query(user_input)
+    hr_response = turn.hr_answer()
     if hr_response:
-        save_message(user_email, chat_id, ai_response=hr_response)
+        turn.save_reply(user_email, chat_id, hr_response)
         return jsonify(response=hr_response, intent="hr_admin")
 
     if is_selection and selected_indices:
+        turn.cancel_speculation()
+        turn.wait_for_user_message()
         return handle_file_selection(selected_indices, token, user_email, chat_id)
     elif session.get("stage") == "awaiting_selection" and is_number_selection(user_input):
+        turn.cancel_speculation()
+        turn.wait_for_user_message()
         return handle_file_selection(user_input, token, user_email, chat_id)
 
     if session.get("stage") == "start":
+        turn.cancel_speculation()
         session["stage"] = "awaiting_query"
         msg = "Hi there! 👋 What file are you looking for today?"
-        save_message(user_email, chat_id, ai_response=msg)
+        turn.save_reply(user_email, chat_id, msg)
         return jsonify(response=msg, intent="greeting")
 
     elif session.get("stage") == "awaiting_query":
-        gpt_result = detect_intent_and_extract(user_input)
+        gpt_result = turn.file_intent()
         intent = gpt_result.get("intent")
         query = gpt_result.get("data")
 
         if intent == "general_response":
             reply = answer_general_query(user_input)
-            save_message(user_email, chat_id, ai_response=reply)
+            turn.save_reply(user_email, chat_id, reply)
             return jsonify(response=reply, intent="general_response")
 
         elif intent == "file_search" and query:
             session["last_query"] = query
-            files = search_all_files(token, query)
+            files = turn.search_files(token, query)
             top_files = files[:5]
             session["found_files"] = top_files
 
             if not top_files:
                 msg = "📁 No files found."
-                save_message(user_email, chat_id, ai_response=msg)
+                turn.save_reply(user_email, chat_id, msg)
                 return jsonify(response=msg, intent="file_search")
 
             exact = [f for f in top_files if f["name"].lower() == query.lower()]
@@ -289,18 +542,18 @@ def chat():
                 if check_file_access(token, file["id"], user_email, file.get("parentReference", {}).get("siteId")):
                     send_notification_email(token, user_email, file["name"], file["webUrl"])
                     msg = f"✅ You have access: {file['webUrl']}"
-                    save_message(user_email, chat_id, ai_response=msg)
+                    turn.save_reply(user_email, chat_id, msg)
                     return jsonify(response=msg, intent="file_search")
                 else:
                     msg = "❌ You don’t have access."
-                    save_message(user_email, chat_id, ai_response=msg)
+                    turn.save_reply(user_email, chat_id, msg)
                     return jsonify(response=msg, intent="file_search")
             else:
                 session["stage"] = "awaiting_selection"
                 return jsonify(response="Select file (e.g., 1,3):", pauseGPT=True, files=top_files)
 
         msg = "⚠️ I couldn’t understand. Please rephrase."
-        save_message(user_email, chat_id, ai_response=msg)
+        turn.save_reply(user_email, chat_id, msg)
         return jsonify(response=msg, intent="error")
 
     return jsonify(response="⚠️ Something went wrong", intent="error")
@@ -379,8 +632,7 @@ def delete_hr_doc():
     if not filename:
         return jsonify({"error": "No filename provided"}), 400
 
-    doc_path = os.path.join("knowledge_base", "documents", filename)
-    metadata_path = os.path.join("knowledge_base", "index_metadata.json")
+    doc_path = os.path.join(DOCS_DIR, filename)
 
     try:
         # Delete the file
@@ -388,12 +640,9 @@ def delete_hr_doc():
             os.remove(doc_path)
 
         # Remove metadata entry
-        if os.path.exists(metadata_path):
-            with open(metadata_path, "r") as f:
-                metadata = json.load(f)
-            metadata.pop(filename, None)
-            with open(metadata_path, "w") as f:
-                json.dump(metadata, f, indent=2)
+        if os.path.exists(METADATA_PATH):
+            with metadata_transaction() as metadata:
+                metadata.pop(filename, None)
 
         # Rebuild index
         build_index()
@@ -0,0 +1,147 @@
+"""
+Chat-history search latency at scale: FTS5 (db.search_messages) against the
+LIKE '%...%' scan it replaces, plus the cost of keeping the index in sync.
+
+Builds a throwaway chat DB with --messages synthetic messages spread over
+--users users (written through the real schema and triggers), then times
+searches for random users and a retention delete of the oldest hour.
+
+    python -m benchmarks.chat_search                       # 1M messages
+    python -m benchmarks.chat_search --messages 100000 --queries 200
+    python -m benchmarks.chat_search --db /tmp/chat_1m.db --keep   # reuse the DB next time
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import db
+from benchmarks.stats import summarize
+
+WORDS = (
+    "report payroll budget policy leave onboarding deck contract invoice forecast slides agenda minutes "
+    "template handbook benefits pension holiday review quarterly annual travel expense laptop access "
+    "sharepoint folder link draft final signed approval manager team project roadmap training"
+).split()
+FILLER = "please can you find the file for me i need it today thanks".split()
+QUERIES = ["onboarding deck", "payroll", "quarterly report", "travel expense policy", "signed contract", "road"]
+
+
+def message(rng):
+    words = rng.sample(FILLER, 4) + rng.sample(WORDS, 3)
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def populate(path, messages, users, days, seed=0):
+    rng = random.Random(seed)
+    db.DB_NAME = path
+    db.init_db()
+    conn = sqlite3.connect(path)
+    start = datetime.now() - timedelta(days=days)
+    span = days * 86400
+    batch = []
+    t = time.perf_counter()
+    for i in range(0, messages, 2):
+        user = f"user{rng.randrange(users)}@contoso.com"
+        chat_id = str(1700000000 + rng.randrange(users * 20))
+        ts = (start + timedelta(seconds=span * i / messages)).strftime("%Y-%m-%d %H:%M:%S")
+        batch.append((user, chat_id, message(rng), None, ts))
+        batch.append((user, chat_id, None, f"Here is the {message(rng)} link", ts))
+        if len(batch) >= 20000:
+            conn.executemany("INSERT INTO chat_history (user_email, chat_id, user_message, ai_response, timestamp) "
+                             "VALUES (?, ?, ?, ?, ?)", batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO chat_history (user_email, chat_id, user_message, ai_response, timestamp) "
+                         "VALUES (?, ?, ?, ?, ?)", batch)
+        conn.commit()
+    conn.close()
+    return time.perf_counter() - t
+
+
+def like_search(path, user_email, text, limit=20):
+    conn = sqlite3.connect(path)
+    pattern = f"%{text}%"
+    rows = conn.execute('''
+        SELECT chat_id, timestamp, user_message, ai_response FROM chat_history
+        WHERE user_email = ? AND (user_message LIKE ? OR ai_response LIKE ?)
+        ORDER BY timestamp DESC LIMIT ?
+    ''', (user_email, pattern, pattern, limit)).fetchall()
+    conn.close()
+    return rows
+
+
+def timed_runs(fn, cases):
+    samples, hits = [], 0
+    for user, text in cases:
+        t = time.perf_counter()
+        hits += bool(fn(user, text))
+        samples.append((time.perf_counter() - t) * 1000)
+    return dict(summarize(samples), hit_rate=round(hits / len(cases), 2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=3, help="spread of message timestamps")
+    parser.add_argument("--queries", type=int, default=100, help="searches per method")
+    parser.add_argument("--db", help="database path (default: a temp file)")
+    parser.add_argument("--keep", action="store_true", help="keep the database for later runs")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="chat-search-"), "chat_history.db")
+    db.DB_NAME = path
+    try:
+        if os.path.exists(path):
+            db.init_db()
+            print(f"📂 Reusing {path}")
+        else:
+            print(f"✍️ Writing {args.messages:,} messages...")
+            elapsed = populate(path, args.messages, args.users, args.days)
+            print(f"   {elapsed:.1f}s ({args.messages / elapsed:,.0f} messages/s with FTS triggers)")
+
+        rng = random.Random(1)
+        cases = [(f"user{rng.randrange(args.users)}@contoso.com", rng.choice(QUERIES)) for _ in range(args.queries)]
+        report = {
+            "fts5": timed_runs(lambda u, q: db.search_messages(u, q), cases),
+            "like": timed_runs(lambda u, q: like_search(path, u, q), cases),
+        }
+
+        conn = sqlite3.connect(path)
+        total = conn.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0]
+        cutoff = conn.execute("SELECT datetime(MIN(timestamp), '+1 hour') FROM chat_history").fetchone()[0]
+        t = time.perf_counter()
+        deleted = conn.execute("DELETE FROM chat_history WHERE timestamp < ?", (cutoff,)).rowcount
+        conn.commit()
+        retention_s = time.perf_counter() - t
+        orphans = conn.execute(
+            "SELECT COUNT(*) FROM chat_history_fts WHERE rowid NOT IN (SELECT id FROM chat_history)"
+        ).fetchone()[0]
+        conn.close()
+    finally:
+        if not args.keep and not args.db:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    print(f"\n{total:,} messages, {args.users} users, {args.queries} searches per method")
+    print(f"{'method':<8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'hit rate':>10}")
+    for name, r in report.items():
+        print(f"{name:<8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}{r['hit_rate']:>10.2f}")
+    print(f"\nRetention delete of {deleted:,} messages (oldest hour): {retention_s:.2f}s, "
+          f"{orphans} orphaned index rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
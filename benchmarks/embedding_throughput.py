@@ -0,0 +1,114 @@
+"""
+Indexing throughput of the local and remote embedding backends.
+
+Splits the sample HR corpus (benchmarks/data/hr_corpus) the same way
+build_index does, repeats it up to --chunks chunks (with a per-copy suffix so
+nothing is served from a cache) and times embed_documents for each backend,
+plus single-query latency for embed_query.
+
+    python -m benchmarks.embedding_throughput                          # local + real OpenAI
+    python -m benchmarks.embedding_throughput --offline --openai-latency 250
+    python -m benchmarks.embedding_throughput --backends local --chunks 5000 --threads 4
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stats import summarize
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hr_corpus")
+
+
+def corpus_chunks(count):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from knowledge_base.build_index import load_documents
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    base = [c.page_content for c in splitter.split_documents(load_documents(CORPUS_DIR))]
+    return [f"{base[i % len(base)]} [copy {i // len(base)}]" for i in range(count)]
+
+
+def bench_backend(backend, texts, query_samples):
+    import embedding_backend
+
+    start = time.perf_counter()
+    embeddings = embedding_backend.get_embeddings(backend)
+    setup_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    index_s = time.perf_counter() - start
+
+    query_ms = []
+    for text in texts[:query_samples]:
+        t = time.perf_counter()
+        embeddings.embed_query(text[:200])
+        query_ms.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "backend": embedding_backend.backend_id(backend),
+        "dim": len(vectors[0]) if vectors else 0,
+        "setup_s": round(setup_s, 2),
+        "index_s": round(index_s, 2),
+        "chunks_per_s": round(len(texts) / index_s, 1) if index_s else 0.0,
+        "query": summarize(query_ms),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["local", "openai"], choices=["local", "openai"])
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, help="LOCAL_EMBEDDING_THREADS for the local backend")
+    parser.add_argument("--batch-size", type=int, help="LOCAL_EMBEDDING_BATCH_SIZE for the local backend")
+    parser.add_argument("--offline", action="store_true", help="send the openai backend to the fake server")
+    parser.add_argument("--openai-latency", type=float, default=250, help="fake server latency per request (ms)")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    # Must be set before embedding_backend is imported
+    if args.threads:
+        os.environ["LOCAL_EMBEDDING_THREADS"] = str(args.threads)
+    if args.batch_size:
+        os.environ["LOCAL_EMBEDDING_BATCH_SIZE"] = str(args.batch_size)
+
+    fake = None
+    if args.offline:
+        from benchmarks.fakes import FakeOpenAIServer
+        fake = FakeOpenAIServer(latency_ms=args.openai_latency).start()
+        os.environ.update({
+            "OPENAI_BASE_URL": f"{fake.base_url}/v1",
+            "OPENAI_API_BASE": f"{fake.base_url}/v1",
+            "OPENAI_API_KEY": "sk-bench",
+        })
+
+    texts = corpus_chunks(args.chunks)
+    report = {}
+    try:
+        for backend in args.backends:
+            report[backend] = bench_backend(backend, texts, args.queries)
+    finally:
+        if fake:
+            fake.stop()
+
+    print(f"\n{len(texts)} chunks")
+    print(f"{'backend':<36}{'dim':>6}{'setup s':>9}{'index s':>9}{'chunks/s':>10}{'query p50':>11}{'query p99':>11}")
+    for r in report.values():
+        print(f"{r['backend']:<36}{r['dim']:>6}{r['setup_s']:>9.2f}{r['index_s']:>9.2f}{r['chunks_per_s']:>10.1f}"
+              f"{r['query']['p50_ms']:>11.1f}{r['query']['p99_ms']:>11.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Recall / latency / memory benchmark for the FAISS index types in knowledge_base/index_types.py.
+
+Generates clustered synthetic embeddings (a Gaussian mixture, which is closer
+to real text embeddings than uniform noise), uses the exact flat index as
+ground truth and reports for each index type and corpus size:
+
+  - build time (train + add)
+  - recall@k against the exact neighbours
+  - p50/p99 single-query latency
+  - index memory footprint
+
+    python -m benchmarks.faiss_index                                 # 10k and 100k chunks
+    python -m benchmarks.faiss_index --sizes 10000 100000 1000000    # add 1M (needs ~2 GB RAM at dim 384)
+    python -m benchmarks.faiss_index --types flat hnsw ivfpq --dim 1536 --k 3
+    FAISS_NPROBE=32 python -m benchmarks.faiss_index --types ivf
+
+Tuning knobs are the same environment variables build_index reads
+(FAISS_NLIST, FAISS_NPROBE, FAISS_HNSW_M, FAISS_HNSW_EF_SEARCH, FAISS_PQ_M, FAISS_TRAIN_SAMPLE).
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+import faiss
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stats import summarize
+from knowledge_base.index_types import INDEX_TYPES, create_index, train_index, index_memory_bytes
+
+
+def synthetic_embeddings(n, dim, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype("float32")
+    return np.ascontiguousarray(vectors, dtype="float32")
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def bench_index(index_type, base, queries, truth, k, latency_queries):
+    start = time.perf_counter()
+    index, params = create_index(index_type, base.shape[1], len(base))
+    train_index(index, base)
+    index.add(base)
+    build_s = time.perf_counter() - start
+
+    _, found = index.search(queries, k)
+
+    latencies = []
+    for q in queries[:latency_queries]:
+        t = time.perf_counter()
+        index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "params": params,
+        "build_s": round(build_s, 2),
+        "recall": round(recall_at_k(found, truth, k), 4),
+        "latency": summarize(latencies),
+        "memory_mb": round(index_memory_bytes(index) / 1024 / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--dim", type=int, default=384, help="384 = MiniLM, 1536 = text-embedding-ada-002")
+    parser.add_argument("--k", type=int, default=12, help="neighbours per query (HR_CONTEXT_CANDIDATES)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--latency-queries", type=int, default=500, help="queries timed one at a time")
+    parser.add_argument("--threads", type=int, default=0, help="faiss OpenMP threads (0 = library default)")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    report = {}
+    for n in args.sizes:
+        print(f"\n📐 {n} chunks, dim {args.dim}, k={args.k}")
+        data = synthetic_embeddings(n + args.queries, args.dim)
+        base, queries = data[:n], data[n:]
+
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(base)
+        _, truth = exact.search(queries, args.k)
+
+        print(f"{'type':<8}{'params':<38}{'build s':>9}{'recall':>8}{'p50 ms':>9}{'p99 ms':>9}{'MB':>9}")
+        report[n] = {}
+        for index_type in args.types:
+            r = bench_index(index_type, base, queries, truth, args.k, args.latency_queries)
+            report[n][index_type] = r
+            params = ",".join(f"{k}={v}" for k, v in r["params"].items() if k != "index_type")
+            print(f"{r['params']['index_type']:<8}{params:<38}{r['build_s']:>9.2f}{r['recall']:>8.3f}"
+                  f"{r['latency']['p50_ms']:>9.3f}{r['latency']['p99_ms']:>9.3f}{r['memory_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Local stand-ins for Microsoft Graph and the OpenAI API.
+
+Both servers run on 127.0.0.1 in a background thread and only implement the
+endpoints this app calls. Latency, throttling (429 + Retry-After) and payload
+size are configurable so benchmarks can reproduce slow or throttled tenants.
+Throttling is either random (throttle_rate) or load driven (rate_limit):
+more than rate_limit requests in one second puts the server into a penalty
+window of retry_after seconds, during which every request gets a 429.
+
+    graph = FakeGraphServer(latency_ms=80, throttle_rate=0.05).start()
+    graph = FakeGraphServer(latency_ms=80, rate_limit=30, retry_after=2).start()
+    os.environ["GRAPH_BASE_URL"] = graph.base_url
+
+They can also run standalone as mocks for manual testing of the app:
+
+    python -m benchmarks.fakes openai --port 8001 --latency 300
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-test python app.py
+"""
+import re
+import sys
+import json
+import time
+import argparse
+import random
+import hashlib
+import threading
+from urllib.parse import unquote, urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeServer:
+    """Shared plumbing: threaded HTTP server, simulated latency and throttling."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, throttle_rate=0.0, retry_after=1, rate_limit=None, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.window = []
+        self.penalty_until = 0.0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.calls = {}
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._dispatch(self, "GET")
+
+            def do_POST(self):
+                server._dispatch(self, "POST")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.request_count,
+                "throttled": self.throttled_count,
+                "calls": dict(self.calls),
+            }
+
+    def _dispatch(self, handler, method):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        path = unquote(handler.path)
+
+        with self.lock:
+            self.request_count += 1
+            throttled = self.throttle_rate and self.random.random() < self.throttle_rate
+            if self.rate_limit:
+                throttled = throttled or self._over_limit(time.monotonic())
+            if throttled:
+                self.throttled_count += 1
+            delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+
+        if delay:
+            time.sleep(delay / 1000.0)
+
+        if throttled:
+            return self._send(handler, 429, {"error": {"code": "TooManyRequests"}},
+                              headers={"Retry-After": str(self.retry_after)})
+
+        try:
+            name, status, payload = self.route(method, path, body)
+        except Exception as e:
+            return self._send(handler, 500, {"error": {"message": str(e)}})
+
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        return self._send(handler, status, payload)
+
+    def _over_limit(self, now):
+        """Sliding one-second window plus a penalty period, like Graph. Caller holds the lock."""
+        if now < self.penalty_until:
+            return True
+        self.window = [t for t in self.window if t > now - 1.0]
+        if len(self.window) >= self.rate_limit:
+            self.penalty_until = now + self.retry_after
+            return True
+        self.window.append(now)
+        return False
+
+    def _send(self, handler, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def route(self, method, path, body):
+        raise NotImplementedError
+
+
+class FakeGraphServer(FakeServer):
+    """
+    Implements the Graph v1.0 calls made by graph_api.py. The tenant shape
+    (sites, drives per site, hits per drive) controls the size of the
+    search_all_files fan-out; `item_padding` adds bytes to every drive item.
+    """
+
+    def __init__(self, sites=5, drives_per_site=2, items_per_search=5, sites_page_size=10,
+                 item_padding=0, **kwargs):
+        super().__init__(**kwargs)
+        self.sites = sites
+        self.drives_per_site = drives_per_site
+        self.items_per_search = items_per_search
+        self.sites_page_size = sites_page_size
+        self.item_padding = item_padding
+
+    def _items(self, scope, query, count):
+        words = query.strip("'\" ") or "file"
+        items = []
+        for i in range(count):
+            item_id = f"{scope}-{i}"
+            item = {
+                "id": item_id,
+                "name": f"{words} {scope} {i}.docx" if i else f"{words}.docx",
+                "webUrl": f"https://contoso.sharepoint.com/{scope}/{item_id}",
+                "size": 1024 * (i + 1),
+                "parentReference": {"driveId": scope},
+            }
+            if self.item_padding:
+                item["description"] = "x" * self.item_padding
+            items.append(item)
+        return items
+
+    def route(self, method, path, body):
+        url = urlparse(path)
+        route = url.path
+        query = parse_qs(url.query)
+
+        if method == "POST" and route.endswith("/me/sendMail"):
+            return "sendMail", 202, None
+
+        if route.endswith("/me"):
+            return "me", 200, {"mail": "bench.user@contoso.com", "userPrincipalName": "bench.user@contoso.com"}
+
+        match = re.search(r"/me/drive/root/search\(q=(.*)\)$", route)
+        if match:
+            return "me_search", 200, {"value": self._items("personal", match.group(1), self.items_per_search)}
+
+        if route.endswith("/me/drive/recent"):
+            return "recent", 200, {"value": self._items("recent", "recent", self.items_per_search)}
+
+        if route.endswith("/sites") and "search" in query:
+            skip = int(query.get("$skip", ["0"])[0])
+            page = [{"id": f"site{i}", "name": f"Site {i}"}
+                    for i in range(skip, min(self.sites, skip + self.sites_page_size))]
+            payload = {"value": page}
+            if skip + self.sites_page_size < self.sites:
+                payload["@odata.nextLink"] = f"{self.base_url}/sites?search=*&$skip={skip + self.sites_page_size}"
+            return "sites", 200, payload
+
+        match = re.search(r"/sites/([^/]+)/drives$", route)
+        if match:
+            site_id = match.group(1)
+            return "drives", 200, {"value": [{"id": f"{site_id}-drive{d}"} for d in range(self.drives_per_site)]}
+
+        match = re.search(r"/drives/([^/]+)/search\(q=(.*)\)$", route)
+        if match:
+            return "drive_search", 200, {"value": self._items(match.group(1), match.group(2), self.items_per_search)}
+
+        if route.endswith("/permissions"):
+            return "permissions", 200, {"value": [{"roles": ["read"], "grantedToV2": {"user": {}}}]}
+
+        return "unknown", 404, {"error": {"code": "itemNotFound", "message": route}}
+
+
+class FakeOpenAIServer(FakeServer):
+    """
+    Implements /v1/chat/completions and /v1/embeddings.
+
+    Chat replies are chosen from the prompt so the app's routing still works:
+    intent classification answers HR_Admin for HR-ish questions, the file
+    intent extractor answers file_search with the remaining keywords.
+    `completion_chars` pads free-text answers; embeddings are deterministic
+    per input so FAISS search results are stable across runs.
+    """
+
+    HR_WORDS = {"leave", "holiday", "holidays", "policy", "benefit", "benefits", "salary", "onboarding", "hr"}
+    FILE_WORDS = {"file", "files", "document", "report", "find", "deck", "sheet"}
+    FILLER = {"find", "the", "a", "me", "my", "file", "document", "report", "send", "please",
+              "related", "about", "on", "for", "get", "deck", "sheet"}
+
+    def __init__(self, embedding_dim=1536, completion_chars=400, model_latency_ms=None, **kwargs):
+        super().__init__(**kwargs)
+        self.embedding_dim = embedding_dim
+        self.completion_chars = completion_chars
+        # Extra latency per chat model, e.g. {"gpt-4": 5000} to exercise client timeouts and fallbacks
+        self.model_latency_ms = model_latency_ms or {}
+
+    def route(self, method, path, body):
+        payload = json.loads(body or b"{}")
+        if path.endswith("/chat/completions"):
+            return "chat", 200, self._chat(payload)
+        if path.endswith("/embeddings"):
+            return "embeddings", 200, self._embeddings(payload)
+        return "unknown", 404, {"error": {"message": path}}
+
+    def _chat(self, payload):
+        extra = self.model_latency_ms.get(payload.get("model"), 0)
+        if extra:
+            time.sleep(extra / 1000.0)
+        messages = payload.get("messages", [])
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if len(messages) > 1 else system.rsplit("\n", 1)[-1]
+        words = re.findall(r"[\w']+", user.lower())
+
+        if system.startswith("Classify the user query"):
+            if self.HR_WORDS.intersection(words):
+                content = "HR_Admin"
+            elif self.FILE_WORDS.intersection(words):
+                content = "File_Operation"
+            else:
+                content = "General"
+        elif "file search application" in system:
+            if self.FILE_WORDS.intersection(words):
+                keywords = " ".join(w for w in words if w not in self.FILLER)
+                content = json.dumps({"intent": "file_search", "data": keywords or "file"})
+            else:
+                content = json.dumps({"intent": "general_response", "data": ""})
+        else:
+            content = ("This is a simulated answer. " * (self.completion_chars // 29 + 1))[:self.completion_chars]
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _vector(self, text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        return [rng.uniform(-1, 1) for _ in range(self.embedding_dim)]
+
+    def _embeddings(self, payload):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, (str, int)) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        total_tokens = 0
+        for i, item in enumerate(inputs):
+            # langchain sends pre-tokenized input (lists of token ids) by default
+            text = item if isinstance(item, str) else " ".join(str(t) for t in item)
+            total_tokens += len(item) if isinstance(item, list) else len(text) // 4
+            data.append({"object": "embedding", "index": i, "embedding": self._vector(text)})
+        return {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake Graph or OpenAI server in the foreground.")
+    parser.add_argument("service", choices=["graph", "openai"])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0, help="ms added to every request")
+    parser.add_argument("--throttle", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-limit", type=int, help="requests per second before throttling")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    cls = FakeGraphServer if args.service == "graph" else FakeOpenAIServer
+    server = cls(latency_ms=args.latency, throttle_rate=args.throttle, rate_limit=args.rate_limit,
+                 retry_after=args.retry_after).start(args.port)
+    suffix = "/v1" if args.service == "openai" else ""
+    print(f"Fake {args.service} server listening on {server.base_url}{suffix} (Ctrl+C to stop)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Graph throughput and tail latency under tenant throttling, with and without
+the shared scheduler (graph_scheduler.py).
+
+Several worker processes (like gunicorn workers) run a mix of interactive
+searches, background searches and emails against a FakeGraphServer that
+answers 429 + Retry-After once it sees more than --rate-limit requests per
+second. Searches replay the Graph calls of search_all_files (without the
+ranking step) through graph_api.retry_request.
+
+    python -m benchmarks.graph_throttling
+    python -m benchmarks.graph_throttling --workers 4 --interactive 4 --background 2 --emails 1 --duration 20
+    python -m benchmarks.graph_throttling --modes scheduled --rate-limit 40 --scheduler-rate 30
+
+Per class it reports completed operations per second, latency percentiles and
+operations that failed (still throttled after retries, or scheduler timeout),
+plus the number of 429s the server handed out.
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fakes import FakeGraphServer
+from benchmarks.stats import summarize
+
+QUERIES = ["payroll", "annual report", "onboarding deck", "budget 2024", "leave policy"]
+
+
+def fan_out(graph_api, token, query):
+    """The Graph requests search_all_files makes for one query. True if every call succeeded."""
+    base = graph_api.GRAPH_BASE_URL
+    headers = {"Authorization": f"Bearer {token}"}
+    ok = graph_api.retry_request(f"{base}/me/drive/root/search(q='{query}')", headers).status_code == 200
+    sites_url = f"{base}/sites?search=*"
+    while sites_url:
+        res = graph_api.retry_request(sites_url, headers)
+        if res.status_code != 200:
+            return False
+        for site in res.json().get("value", []):
+            drives = graph_api.retry_request(f"{base}/sites/{site['id']}/drives", headers)
+            if drives.status_code != 200:
+                ok = False
+                continue
+            for drive in drives.json().get("value", []):
+                res_search = graph_api.retry_request(f"{base}/drives/{drive['id']}/search(q='{query}')", headers)
+                ok = ok and res_search.status_code == 200
+        sites_url = res.json().get("@odata.nextLink")
+    return ok
+
+
+def worker(index, args, scheduled, db_path, barrier, results):
+    os.environ["GRAPH_SCHEDULER"] = "1" if scheduled else "0"
+    os.environ["GRAPH_SCHEDULER_DB"] = db_path
+    os.environ["GRAPH_RATE_PER_SEC"] = str(args.scheduler_rate)
+    os.environ["GRAPH_BURST"] = str(args.scheduler_burst)
+    os.environ["GRAPH_MAX_WAIT"] = str(args.max_wait)
+    import graph_api
+    import graph_scheduler
+
+    samples = []
+    lock = threading.Lock()
+    barrier.wait()
+    stop_at = time.time() + args.duration
+
+    def loop(kind, n):
+        i = 0
+        while time.time() < stop_at:
+            query = QUERIES[(n + i) % len(QUERIES)]
+            start = time.perf_counter()
+            if kind == "email":
+                ok = graph_api.send_email("bench-token", "bench.user@contoso.com", query, "<p>bench</p>")
+            else:
+                with graph_scheduler.request_class(kind):
+                    ok = fan_out(graph_api, "bench-token", query)
+            with lock:
+                samples.append((kind, (time.perf_counter() - start) * 1000, bool(ok)))
+            i += 1
+            if kind != "interactive":
+                time.sleep(args.background_pause)
+
+    threads = []
+    for kind, count in (("interactive", args.interactive), ("background", args.background), ("email", args.emails)):
+        for n in range(count):
+            threads.append(threading.Thread(target=loop, args=(kind, index * 100 + n), daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(samples)
+
+
+def run_mode(args, scheduled, graph):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.workers + 1)
+    results = ctx.Queue()
+    workdir = tempfile.mkdtemp(prefix="graph-throttling-")
+    db_path = os.path.join(workdir, "graph_scheduler.db")
+    procs = [ctx.Process(target=worker, args=(i, args, scheduled, db_path, barrier, results))
+             for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    before = graph.stats()
+    barrier.wait()  # every worker has imported the app modules
+    started = time.time()
+    samples = []
+    for _ in procs:
+        samples.extend(results.get())
+    elapsed = time.time() - started
+    for p in procs:
+        p.join()
+    after = graph.stats()
+    # Let the server's penalty window run out before the next mode
+    time.sleep(args.retry_after)
+
+    report = {"graph_requests": after["requests"] - before["requests"],
+              "graph_429s": after["throttled"] - before["throttled"], "classes": {}}
+    for kind in ("interactive", "background", "email"):
+        rows = [s for s in samples if s[0] == kind]
+        if not rows:
+            continue
+        ok = [ms for _, ms, success in rows if success]
+        report["classes"][kind] = dict(
+            summarize([ms for _, ms, _ in rows]),
+            failed=len(rows) - len(ok),
+            ops_per_s=round(len(ok) / elapsed, 2),
+        )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["unscheduled", "scheduled"], choices=["unscheduled", "scheduled"])
+    parser.add_argument("--workers", type=int, default=3, help="worker processes")
+    parser.add_argument("--interactive", type=int, default=4, help="interactive search threads per worker")
+    parser.add_argument("--background", type=int, default=2, help="background search threads per worker")
+    parser.add_argument("--emails", type=int, default=1, help="email threads per worker")
+    parser.add_argument("--background-pause", type=float, default=0.2, help="seconds between background/email operations")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per mode")
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=40, help="Graph latency per request (ms)")
+    parser.add_argument("--rate-limit", type=int, default=60, help="server-side requests/s before it throttles")
+    parser.add_argument("--retry-after", type=int, default=2, help="Retry-After (and penalty) seconds on 429")
+    parser.add_argument("--scheduler-rate", type=float, default=50, help="GRAPH_RATE_PER_SEC for the scheduled run")
+    parser.add_argument("--scheduler-burst", type=float, default=50, help="GRAPH_BURST for the scheduled run")
+    parser.add_argument("--max-wait", type=float, default=30, help="GRAPH_MAX_WAIT for the scheduled run")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    graph = FakeGraphServer(sites=args.sites, latency_ms=args.latency, rate_limit=args.rate_limit,
+                            retry_after=args.retry_after).start()
+    os.environ["GRAPH_BASE_URL"] = graph.base_url
+    report = {}
+    try:
+        for mode in args.modes:
+            report[mode] = run_mode(args, mode == "scheduled", graph)
+    finally:
+        graph.stop()
+
+    for mode, r in report.items():
+        print(f"\n{mode}: {r['graph_requests']} Graph requests, {r['graph_429s']} throttled (429)")
+        print(f"{'class':<14}{'ops':>6}{'ops/s':>8}{'failed':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for kind, s in r["classes"].items():
+            print(f"{kind:<14}{s['count']:>6}{s['ops_per_s']:>8.2f}{s['failed']:>8}"
+                  f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
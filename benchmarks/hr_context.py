@@ -0,0 +1,142 @@
+"""
+Compare naive top-3 context with token-budgeted context packing on a fixed HR question set.
+
+For every question in benchmarks/data/hr_questions.json both strategies build
+the GPT-4 prompt context from the same FAISS index (built from
+benchmarks/data/hr_corpus, which contains two near-identical leave policy
+versions on purpose) and report:
+
+  - prompt tokens sent to the model
+  - context assembly latency and answer latency
+  - context recall: share of expected facts present in the context
+  - answer quality: share of expected facts present in the model's answer
+
+    python -m benchmarks.hr_context              # real OpenAI (needs OPENAI_API_KEY)
+    python -m benchmarks.hr_context --offline    # fake OpenAI server, sizes/latency only
+    python -m benchmarks.hr_context --budget 800 --candidates 20
+
+The index uses the configured EMBEDDING_BACKEND. With --offline and the
+default openai backend the embeddings are random, so for meaningful recall
+numbers without network run with EMBEDDING_BACKEND=local.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stats import summarize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CORPUS_DIR = os.path.join(DATA_DIR, "hr_corpus")
+QUESTIONS_PATH = os.path.join(DATA_DIR, "hr_questions.json")
+
+
+def build_store():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.vectorstores import FAISS
+    from knowledge_base.build_index import load_documents
+    from embedding_backend import get_embeddings
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100, add_start_index=True)
+    chunks = splitter.split_documents(load_documents(CORPUS_DIR))
+    return FAISS.from_documents(chunks, get_embeddings())
+
+
+def fact_recall(text, expected):
+    lowered = text.lower()
+    return sum(1 for fact in expected if fact.lower() in lowered) / len(expected)
+
+
+def naive_context(store, question, candidates, budget):
+    return "\n\n".join(doc.page_content for doc in store.similarity_search(question, k=3))
+
+
+def packed_context(store, question, candidates, budget):
+    from context_packing import pack_context
+    context, _ = pack_context(store.similarity_search_with_score(question, k=candidates), token_budget=budget)
+    return context
+
+
+STRATEGIES = {"naive_top3": naive_context, "packed": packed_context}
+
+
+def run(args):
+    from context_packing import count_tokens
+    import hr_router
+
+    with open(QUESTIONS_PATH, "r") as f:
+        questions = json.load(f)
+    store = build_store()
+
+    results = {}
+    for name, strategy in STRATEGIES.items():
+        tokens, assembly_ms, answer_ms, recall, quality = [], [], [], [], []
+        for item in questions:
+            start = time.perf_counter()
+            context = strategy(store, item["question"], args.candidates, args.budget)
+            assembly_ms.append((time.perf_counter() - start) * 1000)
+            tokens.append(count_tokens(f"Context:\n{context}\n\nQuestion: {item['question']}"))
+            recall.append(fact_recall(context, item["expected"]))
+
+            if not args.skip_answers:
+                start = time.perf_counter()
+                answer = hr_router.generate_answer_from_context(item["question"], context)
+                answer_ms.append((time.perf_counter() - start) * 1000)
+                quality.append(fact_recall(answer, item["expected"]))
+
+        results[name] = {
+            "prompt_tokens_mean": round(sum(tokens) / len(tokens), 1),
+            "prompt_tokens_max": max(tokens),
+            "assembly": summarize(assembly_ms),
+            "answer": summarize(answer_ms),
+            "context_recall": round(sum(recall) / len(recall), 3),
+            "answer_quality": round(sum(quality) / len(quality), 3) if quality else None,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offline", action="store_true", help="use the local fake OpenAI server")
+    parser.add_argument("--budget", type=int, default=int(os.getenv("HR_CONTEXT_TOKEN_BUDGET", "1500")))
+    parser.add_argument("--candidates", type=int, default=int(os.getenv("HR_CONTEXT_CANDIDATES", "12")))
+    parser.add_argument("--skip-answers", action="store_true", help="only measure context assembly")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    fake = None
+    if args.offline:
+        from benchmarks.fakes import FakeOpenAIServer
+        fake = FakeOpenAIServer(latency_ms=200).start()
+        os.environ.update({
+            "OPENAI_BASE_URL": f"{fake.base_url}/v1",
+            "OPENAI_API_BASE": f"{fake.base_url}/v1",
+            "OPENAI_API_KEY": "sk-bench",
+        })
+    try:
+        results = run(args)
+    finally:
+        if fake:
+            fake.stop()
+
+    print(f"\n{'strategy':<14}{'tokens':>9}{'max':>7}{'build p50':>11}{'answer p50':>12}{'answer p95':>12}"
+          f"{'recall':>9}{'quality':>9}")
+    for name, r in results.items():
+        quality = "-" if r["answer_quality"] is None else f"{r['answer_quality']:.2f}"
+        print(f"{name:<14}{r['prompt_tokens_mean']:>9.0f}{r['prompt_tokens_max']:>7}"
+              f"{r['assembly']['p50_ms']:>11.1f}{r['answer']['p50_ms']:>12.1f}{r['answer']['p95_ms']:>12.1f}"
+              f"{r['context_recall']:>9.2f}{quality:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
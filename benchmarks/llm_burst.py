@@ -0,0 +1,158 @@
+"""
+Bursts of concurrent chat completions against FakeOpenAIServer, sent directly
+through the OpenAI client and through llm_gateway.
+
+Scenarios:
+  burst     --users threads send classify_intent-style prompts (temperature 0)
+            drawn from --distinct different questions. The gateway should
+            collapse them to about one upstream call per distinct prompt.
+  slow      the primary model answers after --slow-ms. The gateway gives up
+            after --timeout seconds and answers from the fallback model, so
+            tail latency stays bounded.
+
+    python -m benchmarks.llm_burst
+    python -m benchmarks.llm_burst --users 64 --rounds 5 --distinct 8 --latency 400
+    python -m benchmarks.llm_burst --scenarios slow --slow-ms 8000 --timeout 2
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fakes import FakeOpenAIServer
+from benchmarks.stats import summarize
+
+CLASSIFY_PROMPT = "Classify the user query as one of: HR_Admin, File_Operation, Email_Operation, General."
+QUESTIONS = [
+    "how many days of annual leave do I get?", "find the payroll report", "send me the onboarding deck",
+    "what is the sick leave policy?", "who approves travel expenses?", "find the q3 budget sheet",
+    "what are the pension benefits?", "hello there", "where is the holiday calendar?", "open the roadmap file",
+]
+
+
+def messages_for(question):
+    return [{"role": "system", "content": CLASSIFY_PROMPT}, {"role": "user", "content": question}]
+
+
+def run_burst(call, users, rounds, distinct):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(users)
+
+    def user(i):
+        nonlocal errors
+        barrier.wait()
+        for r in range(rounds):
+            question = QUESTIONS[(i + r) % distinct]
+            start = time.perf_counter()
+            try:
+                call(messages_for(question))
+                ok = True
+            except Exception:
+                ok = False
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    return dict(summarize(latencies), errors=errors, wall_s=round(time.perf_counter() - start, 2))
+
+
+def measure(server, call, **kwargs):
+    before = server.stats()["calls"].get("chat", 0)
+    result = run_burst(call, **kwargs)
+    result["upstream_calls"] = server.stats()["calls"].get("chat", 0) - before
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["burst", "slow"], choices=["burst", "slow"])
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--distinct", type=int, default=4, help="different questions in the burst")
+    parser.add_argument("--latency", type=float, default=300, help="fake server latency per call (ms)")
+    parser.add_argument("--slow-ms", type=float, default=5000, help="extra latency of the primary model in 'slow'")
+    parser.add_argument("--timeout", type=float, default=1.5, help="gateway deadline for the primary model (s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    args.distinct = max(1, min(args.distinct, len(QUESTIONS)))
+
+    workdir = tempfile.mkdtemp(prefix="llm-burst-")
+    server = FakeOpenAIServer(latency_ms=args.latency).start()
+    # Must be set before llm_gateway is imported
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{server.base_url}/v1",
+        "OPENAI_API_KEY": "sk-bench",
+        "LLM_CACHE_DB": os.path.join(workdir, "llm_cache.db"),
+        "LLM_MAX_CONCURRENCY": str(args.concurrency),
+        "LLM_FALLBACK_MODEL": "gpt-4o-mini",
+    })
+    import openai
+    import llm_gateway
+
+    direct_client = openai.OpenAI(max_retries=0)
+
+    def direct(model, timeout=None):
+        def call(messages):
+            kwargs = {"timeout": timeout} if timeout else {}
+            return direct_client.chat.completions.create(model=model, messages=messages, temperature=0, **kwargs)
+        return call
+
+    def gateway(model, timeout=None):
+        def call(messages):
+            return llm_gateway.chat_completion(model, messages, temperature=0, timeout=timeout)
+        return call
+
+    def measure_gateway(call, cache, **kwargs):
+        # With LLM_CACHE off identical prompts are still coalesced, but no answer is kept
+        llm_gateway.LLM_CACHE = cache
+        return measure(server, call, **kwargs)
+
+    burst = dict(users=args.users, rounds=args.rounds, distinct=args.distinct)
+    report = {}
+    try:
+        if "burst" in args.scenarios:
+            report["burst"] = {
+                "direct": measure(server, direct("gpt-4"), **burst),
+                "gateway (coalesce only)": measure_gateway(gateway("gpt-4"), False, **burst),
+                "gateway (coalesce + cache)": measure_gateway(gateway("gpt-4"), True, **burst),
+            }
+        if "slow" in args.scenarios:
+            server.model_latency_ms = {"gpt-4": args.slow_ms}
+            slow = dict(users=min(args.users, args.concurrency), rounds=1, distinct=len(QUESTIONS))
+            report["slow"] = {
+                "direct": measure(server, direct("gpt-4"), **slow),
+                "gateway (deadline + fallback)": measure_gateway(gateway("gpt-4", timeout=args.timeout), False, **slow),
+            }
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for scenario, modes in report.items():
+        print(f"\n{scenario}")
+        print(f"{'mode':<30}{'calls':>7}{'upstream':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'wall s':>8}")
+        for mode, r in modes.items():
+            print(f"{mode:<30}{r['count']:>7}{r['upstream_calls']:>10}{r['errors']:>8}"
+                  f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['wall_s']:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+End-to-end load test for the Flask app against offline Graph/OpenAI stand-ins.
+
+Drives the real `app` through /chat, /api/chats, /api/messages/<id> and
+/upload_hr_doc with N concurrent simulated users and reports p50/p95/p99 per
+endpoint and per pipeline stage (classify_intent, search_all_files, ...).
+
+    python -m benchmarks.load_test --users 8 --iterations 5
+    python -m benchmarks.load_test --graph-latency 120 --graph-throttle 0.05
+    python -m benchmarks.load_test --save-baseline default
+    python -m benchmarks.load_test --baseline default --tolerance 0.25
+    python -m benchmarks.load_test --sequential --save-baseline sequential   # /chat stages in series
+    python -m benchmarks.load_test --baseline sequential                     # ...vs. the concurrent pipeline
+
+The app runs inside a throwaway working directory (chat DB, token cache, flask
+sessions and the HR index live there) so the repository's own data is never
+touched. MSAL is replaced by a client stub that always returns a token;
+everything else, including the MiniLM ranker and FAISS, is the real code.
+Baselines are machine specific: compare runs from the same host.
+"""
+import os
+import io
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fakes import FakeGraphServer, FakeOpenAIServer
+from benchmarks.stats import Recorder, print_table, save_baseline, compare_to_baseline
+
+# (module, function) pairs timed as pipeline stages. Functions are wrapped in the
+# namespace they are called from, so nested calls are attributed correctly.
+STAGES = {
+    "app": [
+        "answer_general_query", "check_file_access", "send_notification_email", "send_multiple_file_email",
+        "save_message", "get_user_chats", "get_chat_messages", "delete_old_chats",
+        "load_token_cache", "save_token_cache", "build_index",
+    ],
+    "chat_pipeline": [
+        "classify_intent", "answer_hr_query", "detect_intent_and_extract", "search_all_files", "save_message",
+    ],
+    "hr_router": ["search_hr_knowledge_base", "generate_answer_from_context"],
+    "graph_api": ["rank_files_by_similarity", "retry_request"],
+}
+
+SAMPLE_DOC = (
+    "Annual leave policy. Full-time employees receive 20 days of paid annual leave per year. "
+    "Leave requests must be approved by the line manager at least two weeks in advance. "
+    "Public holidays are not deducted from the annual leave allowance.\n\n"
+    "Onboarding. New starters receive the onboarding deck on their first day from HR.\n"
+)
+
+
+class FakeMsalApp:
+    """Stands in for msal.ConfidentialClientApplication in /chat."""
+
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def get_accounts(self):
+        return [{"home_account_id": "bench"}]
+
+    def acquire_token_silent(self, scopes, account=None):
+        return {"access_token": "bench-token"}
+
+
+def prepare_environment(workdir, graph, openai_server, admin_emails, sequential=False):
+    os.makedirs(os.path.join(workdir, "knowledge_base", "documents"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "knowledge_base", "faiss_index"), exist_ok=True)
+    os.environ.update({
+        "GRAPH_BASE_URL": graph.base_url,
+        "OPENAI_BASE_URL": f"{openai_server.base_url}/v1",
+        "OPENAI_API_BASE": f"{openai_server.base_url}/v1",
+        "OPENAI_API_KEY": "sk-bench",
+        "CLIENT_SECRET": "bench-secret",
+        "SCOPE": "Files.Read Mail.Send",
+        "TOKEN_DB_PATH": f"sqlite:///{os.path.join(workdir, 'token_cache.db')}",
+        "HR_ADMIN_EMAILS": ",".join(admin_emails),
+        "HR_DOCUMENTS_PATH": os.path.join(workdir, "knowledge_base", "documents"),
+        "HR_INDEX_PATH": os.path.join(workdir, "knowledge_base", "faiss_index"),
+        "CHAT_PARALLEL": "0" if sequential else "1",
+    })
+    os.chdir(workdir)
+
+
+def instrument(recorder):
+    """Wrap stage functions with timers and stub MSAL. Returns the app module."""
+    import app as app_module
+    import chat_pipeline
+    import hr_router
+    import graph_api
+
+    modules = {"app": app_module, "chat_pipeline": chat_pipeline, "hr_router": hr_router, "graph_api": graph_api}
+    for mod_name, names in STAGES.items():
+        module = modules[mod_name]
+        for name in names:
+            original = getattr(module, name)
+
+            def wrapper(*args, __original=original, __name=name, **kwargs):
+                start = time.perf_counter()
+                ok = True
+                try:
+                    return __original(*args, **kwargs)
+                except Exception:
+                    ok = False
+                    raise
+                finally:
+                    recorder.add(__name, (time.perf_counter() - start) * 1000, ok)
+
+            setattr(module, name, functools.wraps(original)(wrapper))
+
+    app_module.build_msal_app = FakeMsalApp
+    graph_api.build_msal_app = FakeMsalApp
+    app_module.app.config["TESTING"] = True
+    return app_module
+
+
+class SimulatedUser:
+    def __init__(self, app_module, email, endpoints, index=0):
+        self.email = email
+        self.endpoints = endpoints
+        self.client = app_module.app.test_client()
+        self.chat_id = str(int(time.time()) + index)
+        with self.client.session_transaction() as sess:
+            sess["account_id"] = f"acct-{email}"
+            sess["user_email"] = email
+            sess["token"] = "bench-token"
+            sess["chat_id"] = self.chat_id
+            sess["stage"] = "start"
+            sess["found_files"] = []
+
+    def call(self, name, method, url, **kwargs):
+        start = time.perf_counter()
+        res = self.client.open(url, method=method, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.endpoints.add(name, elapsed, ok=res.status_code < 400)
+        return res
+
+    def chat(self, message, **extra):
+        body = {"message": message, "chat_id": self.chat_id}
+        body.update(extra)
+        return self.call("POST /chat", "POST", "/chat", json=body)
+
+    def upload(self, index):
+        data = {"file": (io.BytesIO(SAMPLE_DOC.encode("utf-8")), f"bench_policy_{self.email}_{index}.txt")}
+        return self.call("POST /upload_hr_doc", "POST", "/upload_hr_doc",
+                         data=data, content_type="multipart/form-data")
+
+    def run_iteration(self, iteration, upload):
+        self.call("GET /api/chats", "GET", "/api/chats")
+        self.chat("hello")
+        res = self.chat("find the payroll report")
+        if res.is_json and res.get_json().get("files"):
+            self.chat("", selectionStage=True, selectedIndices=[1])
+        self.chat("how many days of annual leave do I get?")
+        self.call("GET /api/messages/<id>", "GET", f"/api/messages/{self.chat_id}")
+        if upload:
+            self.upload(iteration)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="docufind-bench-")
+    graph = FakeGraphServer(
+        latency_ms=args.graph_latency, jitter_ms=args.graph_jitter, throttle_rate=args.graph_throttle,
+        retry_after=args.retry_after, sites=args.sites, drives_per_site=args.drives_per_site,
+        items_per_search=args.items_per_search, item_padding=args.payload_padding,
+    ).start()
+    openai_server = FakeOpenAIServer(
+        latency_ms=args.openai_latency, jitter_ms=args.openai_jitter, throttle_rate=args.openai_throttle,
+        retry_after=args.retry_after, completion_chars=args.completion_chars, embedding_dim=args.embedding_dim,
+    ).start()
+
+    users = [f"user{i}@contoso.com" for i in range(args.users)]
+    cwd = os.getcwd()
+    try:
+        prepare_environment(workdir, graph, openai_server, admin_emails=users[:max(1, args.admins)],
+                            sequential=args.sequential)
+        stages = Recorder()
+        endpoints = Recorder()
+        app_module = instrument(stages)
+
+        # Seed the HR index so HR questions hit FAISS instead of "Knowledge base not found."
+        SimulatedUser(app_module, users[0], Recorder()).upload("seed")
+
+        sims = [SimulatedUser(app_module, email, endpoints, i) for i, email in enumerate(users)]
+        barrier = threading.Barrier(len(sims))
+
+        def drive(idx):
+            sim = sims[idx]
+            barrier.wait()
+            for it in range(args.iterations):
+                sim.run_iteration(it, upload=idx < args.admins and it < args.uploads)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(sims)) as pool:
+            list(pool.map(drive, range(len(sims))))
+        wall = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        graph.stop()
+        openai_server.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoint_report = endpoints.report()
+    total = sum(s["count"] for s in endpoint_report.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline", "output")},
+        "summary": {"wall_s": round(wall, 2), "requests": total, "rps": round(total / wall, 2) if wall else 0.0},
+        "endpoints": endpoint_report,
+        "stages": stages.report(),
+        "upstream": {"graph": graph.stats(), "openai": openai_server.stats()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=3, help="conversation loops per user")
+    parser.add_argument("--admins", type=int, default=1, help="users that are HR admins and upload documents")
+    parser.add_argument("--uploads", type=int, default=1, help="uploads per admin user")
+    parser.add_argument("--graph-latency", type=float, default=50, help="ms added to every Graph call")
+    parser.add_argument("--graph-jitter", type=float, default=20)
+    parser.add_argument("--graph-throttle", type=float, default=0.0, help="fraction of Graph calls answered with 429")
+    parser.add_argument("--openai-latency", type=float, default=300, help="ms added to every OpenAI call")
+    parser.add_argument("--openai-jitter", type=float, default=100)
+    parser.add_argument("--openai-throttle", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--drives-per-site", type=int, default=2)
+    parser.add_argument("--items-per-search", type=int, default=5)
+    parser.add_argument("--payload-padding", type=int, default=0, help="extra bytes per Graph drive item")
+    parser.add_argument("--completion-chars", type=int, default=400)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--sequential", action="store_true",
+                        help="run /chat stages one after another (CHAT_PARALLEL=0) for before/after comparisons")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", help="write the full JSON report here")
+    parser.add_argument("--save-baseline", metavar="NAME", help="store this run as benchmarks/baselines/NAME.json")
+    parser.add_argument("--baseline", metavar="NAME", help="compare against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print(f"\n{report['summary']['requests']} requests in {report['summary']['wall_s']}s "
+          f"({report['summary']['rps']} req/s)")
+    print_table("Endpoints (ms)", report["endpoints"])
+    print_table("Stages (ms)", report["stages"])
+    print(f"\nUpstream calls: {json.dumps(report['upstream'])}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        print(f"💾 Baseline saved to {save_baseline(args.save_baseline, report)}")
+    if args.baseline:
+        regressions = compare_to_baseline(args.baseline, report, tolerance=args.tolerance)
+        if regressions:
+            print("\n❌ Regressions vs baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ Within {int(args.tolerance * 100)}% of baseline '{args.baseline}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
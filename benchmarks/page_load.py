@@ -0,0 +1,147 @@
+"""
+Bytes on the wire and worker time per frontend page load, with and without
+the static asset layer (static_assets.py).
+
+A logged-in browser is simulated with the Flask test client. It fetches "/"
+and every script, stylesheet and image that index.html references, sending
+Accept-Encoding: gzip, deflate, br. A repeat visit honours what a browser
+caches: immutable assets are not requested again, and everything else is
+revalidated with If-None-Match.
+
+    python -m benchmarks.page_load
+    python -m benchmarks.page_load --loads 200 --output page_load.json
+
+Needs a built frontend (frontend/dist). Install `brotli` to include br
+variants. Worker time is the CPU time the request thread spent inside the
+app, i.e. what a gunicorn worker pays per page load.
+"""
+import os
+import re
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fakes import FakeGraphServer, FakeOpenAIServer
+from benchmarks.load_test import prepare_environment
+from benchmarks.stats import summarize
+
+ACCEPT_ENCODING = "gzip, deflate, br"
+REFERENCE_RE = re.compile(r'(?:src|href)="(/[^"]+)"')
+
+
+class Browser:
+    """Just enough of a browser HTTP cache to model first and repeat visits."""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}  # url -> (etag, cache_control)
+
+    def get(self, url):
+        cached = self.cache.get(url)
+        if cached and "immutable" in (cached[1] or ""):
+            return None
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        if cached and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        res = self.client.get(url, headers=headers)
+        if res.status_code == 200:
+            self.cache[url] = (res.headers.get("ETag"), res.headers.get("Cache-Control"))
+        return res
+
+    def load_page(self):
+        """Returns (requests sent, bytes received, wall ms, worker cpu ms)."""
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        index = self.client.get("/", headers={"Accept-Encoding": ACCEPT_ENCODING})
+        html = index.get_data(as_text=True)
+        sent, received = 1, _wire_bytes(index)
+        urls = sorted(set(REFERENCE_RE.findall(html)))
+        for url in urls:
+            res = self.get(url)
+            if res is not None:
+                sent += 1
+                received += _wire_bytes(res)
+        return sent, received, (time.perf_counter() - wall) * 1000, (time.thread_time() - cpu) * 1000
+
+
+def _wire_bytes(res):
+    headers = sum(len(k) + len(v) + 4 for k, v in res.headers.items())
+    return headers + len(res.get_data())
+
+
+def measure(app_module, loads, email):
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_email"] = email
+        sess["account_id"] = "bench"
+
+    def run(visit):
+        rows = []
+        for _ in range(loads):
+            browser = Browser(client)
+            if visit == "repeat":
+                browser.load_page()
+            rows.append(browser.load_page())
+        return {
+            "requests": rows[0][0],
+            "bytes": rows[0][1],
+            "wall": summarize([r[2] for r in rows]),
+            "worker_cpu": summarize([r[3] for r in rows]),
+        }
+
+    return {"first": run("first"), "repeat": run("repeat")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=int, default=100, help="page loads per mode and visit type")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="docufind-page-load-")
+    graph = FakeGraphServer().start()
+    openai_server = FakeOpenAIServer().start()
+    cwd = os.getcwd()
+    report = {}
+    try:
+        prepare_environment(workdir, graph, openai_server, admin_emails=["bench.user@contoso.com"])
+        os.environ["STATIC_MANIFEST"] = "1"
+        import app as app_module
+        import static_assets
+
+        layer = app_module.app.wsgi_app
+        if not isinstance(layer, static_assets.StaticAssets):
+            print("❌ Static asset layer is not installed (is frontend/dist built?)")
+            return 1
+
+        app_module.app.wsgi_app = layer.app
+        report["flask"] = measure(app_module, args.loads, "bench.user@contoso.com")
+        app_module.app.wsgi_app = layer
+        report["manifest"] = measure(app_module, args.loads, "bench.user@contoso.com")
+    finally:
+        os.chdir(cwd)
+        graph.stop()
+        openai_server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'mode':<10}{'visit':<8}{'requests':>9}{'KB':>10}{'wall p50':>10}{'cpu p50':>9}{'cpu p95':>9}")
+    for mode, visits in report.items():
+        for visit, r in visits.items():
+            print(f"{mode:<10}{visit:<8}{r['requests']:>9}{r['bytes'] / 1024:>10.1f}"
+                  f"{r['wall']['p50_ms']:>10.2f}{r['worker_cpu']['p50_ms']:>9.2f}{r['worker_cpu']['p95_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import os
+import json
+import math
+import threading
+from collections import defaultdict
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 2) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 2),
+        "p95_ms": round(percentile(samples_ms, 95), 2),
+        "p99_ms": round(percentile(samples_ms, 99), 2),
+        "max_ms": round(max(samples_ms), 2) if samples_ms else 0.0,
+    }
+
+
+class Recorder:
+    """Thread-safe collection of latency samples grouped by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(int)
+
+    def add(self, name, elapsed_ms, ok=True):
+        with self._lock:
+            self._samples[name].append(elapsed_ms)
+            if not ok:
+                self._errors[name] += 1
+
+    def report(self):
+        with self._lock:
+            out = {}
+            for name in sorted(self._samples):
+                out[name] = summarize(self._samples[name])
+                out[name]["errors"] = self._errors.get(name, 0)
+            return out
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'name':<40}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for name, s in rows.items():
+        print(f"{name:<40}{s['count']:>8}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s.get('errors', 0):>8}")
+
+
+def save_baseline(name, report):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare_to_baseline(name, report, tolerance=0.2, metric="p95_ms", min_delta_ms=5.0):
+    """
+    Compare `report` against a stored baseline.
+    Returns a list of human readable regressions (empty when everything is within tolerance).
+    Small absolute changes (< min_delta_ms) are ignored to avoid flagging noise on fast paths.
+    """
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No baseline named '{name}' in {BASELINE_DIR}")
+    with open(path, "r") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for section, entries in baseline.items():
+        if not isinstance(entries, dict):
+            continue
+        for key, old in entries.items():
+            new = report.get(section, {}).get(key)
+            if not isinstance(old, dict) or not isinstance(new, dict) or metric not in old:
+                continue
+            before, after = old[metric], new.get(metric, 0.0)
+            if after - before > min_delta_ms and after > before * (1 + tolerance):
+                regressions.append(f"{section}/{key}: {metric} {before:.1f} -> {after:.1f}")
+    return regressions
@@ -0,0 +1,97 @@
+"""
+Per-worker memory report for a running gunicorn master (Linux only).
+
+RSS counts shared pages once per process, so it overstates what each worker
+costs. PSS splits shared pages between the processes sharing them and USS is
+the memory that is truly private to a worker, i.e. what one more worker adds.
+
+    python -m benchmarks.worker_memory                # find the gunicorn master automatically
+    python -m benchmarks.worker_memory --pid 12345 --budget-mb 3500
+
+Compare a default run against one with GUNICORN_MEMORY_MODE=1 (preload + mmap).
+"""
+import os
+import sys
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from metrics import process_memory
+
+
+def _stat(pid):
+    with open(f"/proc/{pid}/stat", "r") as f:
+        data = f.read()
+    # comm may contain spaces; the fields after it are fixed
+    comm = data[data.index("(") + 1:data.rindex(")")]
+    ppid = int(data[data.rindex(")") + 2:].split()[1])
+    return comm, ppid
+
+
+def _cmdline(pid):
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode(errors="replace")
+
+
+def find_master():
+    candidates = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            if "gunicorn" in _cmdline(entry) and "gunicorn" not in _cmdline(_stat(entry)[1]):
+                candidates.append(int(entry))
+        except OSError:
+            continue
+    return min(candidates) if candidates else None
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                if _stat(entry)[1] == pid:
+                    found.append(int(entry))
+            except OSError:
+                continue
+    return sorted(found)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pid", type=int, help="gunicorn master pid (default: auto-detect)")
+    parser.add_argument("--budget-mb", type=float, help="node memory available to the app, to estimate worker capacity")
+    args = parser.parse_args(argv)
+
+    master = args.pid or find_master()
+    if not master:
+        print("❌ No gunicorn master found. Pass --pid.")
+        return 1
+
+    mb = 1024 * 1024
+    rows = [("master", master, process_memory(master))]
+    rows += [("worker", pid, process_memory(pid)) for pid in children(master)]
+
+    print(f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}")
+    for role, pid, mem in rows:
+        print(f"{role:<8}{pid:>8}{mem['rss'] / mb:>10.1f}{mem.get('pss', 0) / mb:>10.1f}{mem.get('uss', 0) / mb:>10.1f}")
+
+    workers = [mem for role, _, mem in rows if role == "worker"]
+    total_pss = sum(mem.get("pss", 0) for _, _, mem in rows)
+    print(f"\nTotal PSS (actual footprint): {total_pss / mb:.1f} MB across {len(workers)} workers")
+    if workers:
+        avg_uss = sum(m.get("uss", 0) for m in workers) / len(workers)
+        avg_rss = sum(m["rss"] for m in workers) / len(workers)
+        print(f"Per worker: RSS {avg_rss / mb:.1f} MB, private (USS) {avg_uss / mb:.1f} MB")
+        if args.budget_mb and avg_uss:
+            shared = total_pss - sum(m.get("uss", 0) for m in workers)
+            fit = int((args.budget_mb * mb - shared) // avg_uss)
+            print(f"Estimated workers that fit in {args.budget_mb:.0f} MB: {max(0, fit)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Concurrent execution of the independent /chat stages.
+
+    request thread                      stage pool
+    ──────────────                      ──────────
+    token refresh                       classify_intent ──► HR_Admin? KB search + answer
+    save user message ───────────►      detect_intent_and_extract
+                                              │ file_search + token known
+                                              ▼
+                                        search_all_files (speculative,
+                                        via the per-user result cache)
+
+The HR classification and the file-intent extraction are both started as
+soon as the turn begins. If the extraction yields keywords, the Graph
+search starts right away instead of waiting for the classifier. Speculative
+work is cancelled when it turns out to be unneeded (HR answer, selection,
+greeting): queued futures are dropped, and a running search stops at its
+next Graph call.
+
+CHAT_PARALLEL=0 runs every stage inline in the request thread, in the
+original order. Use it as the "before" case when benchmarking.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+from hr_router import classify_intent, answer_hr_query
+from openai_api import detect_intent_and_extract
+from graph_api import search_all_files
+from db import save_message
+from search_cache import search_cache
+
+CHAT_PARALLEL = os.getenv("CHAT_PARALLEL", "1") != "0"
+CHAT_PIPELINE_WORKERS = int(os.getenv("CHAT_PIPELINE_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Created lazily so threads are started in the worker, not the preloading master
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=CHAT_PIPELINE_WORKERS, thread_name_prefix="chat-stage")
+    return _executor
+
+
+class _Completed:
+    """Future-like wrapper for a stage that ran inline (sequential mode)."""
+
+    def __init__(self, fn, args, kwargs):
+        self._result = None
+        self._error = None
+        try:
+            self._result = fn(*args, **kwargs)
+        except Exception as e:
+            self._error = e
+
+    def result(self, timeout=None):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def done(self):
+        return True
+
+    def cancel(self):
+        return False
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+
+def _run_for(owner, fn, args, kwargs):
+    with profiler.adopt(owner):
+        return fn(*args, **kwargs)
+
+
+def submit(fn, *args, **kwargs):
+    """Run `fn` on the stage pool (or inline when CHAT_PARALLEL=0) and return a future."""
+    return submit_for(threading.get_ident(), fn, *args, **kwargs)
+
+
+def submit_for(owner, fn, *args, **kwargs):
+    """Like submit, but profiles the work under `owner` (a request thread id) whichever thread submits it."""
+    if not CHAT_PARALLEL:
+        return _Completed(fn, args, kwargs)
+    return _get_executor().submit(_run_for, owner, fn, args, kwargs)
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Fire-and-forget housekeeping (e.g. retention deletes); errors are logged."""
+    def log_errors(future):
+        try:
+            future.result()
+        except Exception as e:
+            logging.error(f"Background task {fn.__name__} failed: {e}")
+
+    submit(fn, *args, **kwargs).add_done_callback(log_errors)
+
+
+class ChatTurn:
+    """The stages of one /chat request and the futures that connect them."""
+
+    def __init__(self, user_input, expects_file_query, speculate=True):
+        """
+        speculate=False (no logged-in session yet) starts nothing: LLM stages then only
+        run if the request gets far enough to ask for them.
+        """
+        self.user_input = user_input
+        # The search may be started from a pool thread (detect's done-callback); profile it as this request
+        self._owner = threading.get_ident()
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._token = None
+        self._user = None
+        self._identity = None
+        self._user_saved = None
+        self._search = None
+        self._search_query = None
+        self._classify = None
+        self._detect = None
+
+        if CHAT_PARALLEL and speculate:
+            self._classify = submit_for(self._owner, classify_intent, user_input)
+            if expects_file_query:
+                self._detect = submit_for(self._owner, detect_intent_and_extract, user_input)
+                self._detect.add_done_callback(lambda _: self._maybe_start_search())
+
+    def set_token(self, token, user_email=None, account_id=None):
+        self._user = user_email
+        self._identity = account_id
+        self._token = token
+        self._maybe_start_search()
+
+    def _cached_search(self, token, query, cancel_event=None):
+        def search(q):
+            return search_all_files(token, q, cancel_event=cancel_event)
+
+        def refresh(q):
+            # Runs after this turn is closed (and self.cancelled set), so it must not see the cancel event
+            return search_all_files(token, q)
+
+        if not self._user:
+            return search(query)
+        return search_cache.get_or_search(
+            self._user, self._identity, query, search, cancel_event=cancel_event, refresh_fn=refresh)
+
+    def _maybe_start_search(self):
+        with self._lock:
+            if self._search is not None or not self._token or self.cancelled.is_set():
+                return
+            if self._detect is None or not self._detect.done():
+                return
+            try:
+                gpt_result = self._detect.result()
+            except Exception:
+                return
+            query = gpt_result.get("data")
+            if gpt_result.get("intent") != "file_search" or not query:
+                return
+            self._search_query = query
+            self._search = submit_for(self._owner, self._cached_search, self._token, query, cancel_event=self.cancelled)
+
+    def save_user_message(self, user_email, chat_id):
+        self._user_saved = submit_for(self._owner, save_message, user_email, chat_id, user_message=self.user_input)
+
+    def wait_for_user_message(self):
+        # Replies must land after the user's message (and its chat title row)
+        if self._user_saved is not None:
+            self._user_saved.result()
+
+    def save_reply(self, user_email, chat_id, message):
+        self.wait_for_user_message()
+        save_message(user_email, chat_id, ai_response=message)
+
+    def hr_answer(self):
+        """Same contract as hr_router.handle_query: an answer for HR questions, else None."""
+        intent = self._classify.result() if self._classify else classify_intent(self.user_input)
+        if intent != "HR_Admin":
+            return None
+        self.cancel_speculation()
+        return answer_hr_query(self.user_input)
+
+    def file_intent(self):
+        if self._detect is None:
+            self._detect = _Completed(detect_intent_and_extract, (self.user_input,), {})
+        return self._detect.result()
+
+    def search_files(self, token, query):
+        with self._lock:
+            speculative = self._search if self._search_query == query else None
+        if speculative is not None:
+            return speculative.result()
+        return self._cached_search(token, query)
+
+    def cancel_speculation(self):
+        self.cancelled.set()
+        for future in (self._classify, self._detect, self._search):
+            if future is not None:
+                future.cancel()
+
+    def close(self):
+        """
+        Make sure nothing speculative outlives the request, and the user message is stored.
+        Runs in a finally block, so a failed save is logged rather than raised over the request's own error.
+        """
+        self.cancel_speculation()
+        try:
+            self.wait_for_user_message()
+        except Exception as e:
+            logging.error(f"❌ Saving the user message failed: {e}")
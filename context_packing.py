@@ -0,0 +1,179 @@
+"""
+Context assembly for HR answer generation.
+
+Takes a scored FAISS candidate set and turns it into the prompt context:
+adjacent/overlapping chunks of the same document are stitched back
+together, near-duplicate passages (e.g. two versions of the same policy)
+are dropped, and what is left is packed most-relevant-first into a token
+budget.
+"""
+import os
+import re
+import logging
+
+HR_CONTEXT_CANDIDATES = int(os.getenv("HR_CONTEXT_CANDIDATES", "12"))
+HR_CONTEXT_TOKEN_BUDGET = int(os.getenv("HR_CONTEXT_TOKEN_BUDGET", "1500"))
+HR_CONTEXT_DUP_THRESHOLD = float(os.getenv("HR_CONTEXT_DUP_THRESHOLD", "0.8"))
+
+SHINGLE_SIZE = 3
+MIN_TEXT_OVERLAP = 20
+MAX_ADJACENT_GAP = 2  # the splitter strips the whitespace between neighbouring chunks
+
+_encoding = None
+
+
+def count_tokens(text):
+    """cl100k token count when tiktoken is available, ~4 chars/token otherwise."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+class Passage:
+    def __init__(self, text, score, source, start=None):
+        self.text = text
+        self.score = score  # FAISS L2 distance: lower is more relevant
+        self.source = source
+        self.start = start
+        self.chunks = 1
+        self._shingles = None
+
+    @property
+    def end(self):
+        return None if self.start is None else self.start + len(self.text)
+
+    @property
+    def shingles(self):
+        if self._shingles is None:
+            words = re.findall(r"\w+", self.text.lower())
+            self._shingles = {
+                " ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))
+            }
+        return self._shingles
+
+
+def _text_overlap(a, b):
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if shorter than MIN_TEXT_OVERLAP)."""
+    for size in range(min(len(a), len(b)), MIN_TEXT_OVERLAP - 1, -1):
+        if a.endswith(b[:size]):
+            return size
+    return 0
+
+
+def _try_merge(a, b):
+    """Stitch b onto a if they are adjacent or overlapping pieces of the same document."""
+    if a.source != b.source:
+        return None
+    if a.start is not None and b.start is not None:
+        if b.start < a.start:
+            a, b = b, a
+        if b.start > a.end + MAX_ADJACENT_GAP:
+            return None
+        tail = b.text[max(0, a.end - b.start):]
+        text = a.text + ("\n" if b.start > a.end else "") + tail
+    else:
+        overlap = _text_overlap(a.text, b.text)
+        if not overlap:
+            overlap = _text_overlap(b.text, a.text)
+            if not overlap:
+                return None
+            a, b = b, a
+        text = a.text + b.text[overlap:]
+    merged = Passage(text, min(a.score, b.score), a.source, a.start)
+    merged.chunks = a.chunks + b.chunks
+    return merged
+
+
+def _is_near_duplicate(candidate, kept, threshold):
+    a = candidate.shingles
+    for other in kept:
+        b = other.shingles
+        inter = len(a & b)
+        if not inter:
+            continue
+        jaccard = inter / len(a | b)
+        containment = inter / min(len(a), len(b))
+        if jaccard >= threshold or containment >= max(threshold, 0.9):
+            return True
+    return False
+
+
+def pack_context(scored_docs, token_budget=HR_CONTEXT_TOKEN_BUDGET, dup_threshold=HR_CONTEXT_DUP_THRESHOLD):
+    """
+    Build the prompt context from (Document, score) pairs.
+    Returns (context, stats) where stats reports candidates, merges, duplicates and tokens used.
+    """
+    passages = [
+        Passage(
+            doc.page_content,
+            score,
+            (doc.metadata.get("source"), doc.metadata.get("page")),
+            doc.metadata.get("start_index"),
+        )
+        for doc, score in sorted(scored_docs, key=lambda pair: pair[1])
+    ]
+
+    # 🧩 Merge neighbours of the same document (keep merging until stable).
+    # A merge that would no longer fit the budget is not made, so the best chunk is never priced out.
+    merged = []
+    for passage in passages:
+        current = passage
+        changed = True
+        while changed:
+            changed = False
+            for i, existing in enumerate(merged):
+                combined = _try_merge(existing, current)
+                if combined and count_tokens(combined.text) <= token_budget:
+                    current = combined
+                    merged.pop(i)
+                    changed = True
+                    break
+        merged.append(current)
+    merged.sort(key=lambda p: p.score)
+
+    # 🧹 Drop near-duplicates, keeping the more relevant copy
+    unique = []
+    duplicates = 0
+    for passage in merged:
+        if _is_near_duplicate(passage, unique, dup_threshold):
+            duplicates += 1
+            continue
+        unique.append(passage)
+
+    # 📦 Pack by relevance into the budget; skip passages that don't fit, try smaller ones
+    selected = []
+    used = 0
+    separator_tokens = count_tokens("\n\n")
+    for passage in unique:
+        tokens = count_tokens(passage.text)
+        cost = tokens + (separator_tokens if selected else 0)
+        if used + cost > token_budget:
+            continue
+        selected.append(passage)
+        used += cost
+
+    if not selected and unique:
+        # Even the best passage is over budget: truncate it rather than sending nothing
+        best = unique[0].text
+        while best and count_tokens(best) > token_budget:
+            best = best[:int(len(best) * 0.9)]
+        selected = [Passage(best, unique[0].score, unique[0].source)]
+        used = count_tokens(best)
+
+    stats = {
+        "candidates": len(passages),
+        "merged": len(passages) - len(merged),
+        "duplicates": duplicates,
+        "passages": len(selected),
+        "tokens": used,
+        "budget": token_budget,
+    }
+    logging.info(f"HR context packed: {stats}")
+    return "\n\n".join(p.text for p in selected), stats
@@ -1,7 +1,50 @@
+import re
+import html
 import sqlite3
+import logging
 from datetime import datetime, timedelta
+from metrics import timed
 
 DB_NAME = "chat_history.db"
+SEARCH_MAX_RESULTS = 50
+
+# Full-text index over chat_history (title rows excluded), kept in sync by triggers.
+# `owner` holds one token per user so a search only walks the caller's postings;
+# user_email is also stored and checked exactly, so a token collision can never leak rows.
+FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+        owner, user_message, ai_response,
+        user_email UNINDEXED, chat_id UNINDEXED, timestamp UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history
+    WHEN new.user_message IS NULL OR substr(new.user_message, 1, 7) != '[TITLE]'
+    BEGIN
+        INSERT INTO chat_history_fts (rowid, owner, user_message, ai_response, user_email, chat_id, timestamp)
+        VALUES (new.id, 'u' || hex(lower(new.user_email)), new.user_message, new.ai_response,
+                new.user_email, new.chat_id, new.timestamp);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history
+    BEGIN
+        DELETE FROM chat_history_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE ON chat_history
+    BEGIN
+        DELETE FROM chat_history_fts WHERE rowid = old.id;
+        INSERT INTO chat_history_fts (rowid, owner, user_message, ai_response, user_email, chat_id, timestamp)
+        SELECT new.id, 'u' || hex(lower(new.user_email)), new.user_message, new.ai_response,
+               new.user_email, new.chat_id, new.timestamp
+        WHERE new.user_message IS NULL OR substr(new.user_message, 1, 7) != '[TITLE]';
+    END
+    ''',
+]
 
 def init_db():
     conn = sqlite3.connect(DB_NAME)
@@ -16,9 +59,31 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    # Retention deletes by age
+    c.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)')
+    init_search_index(c)
     conn.commit()
     conn.close()
 
+def init_search_index(c):
+    c.execute("SELECT 1 FROM sqlite_master WHERE name = 'chat_history_fts'")
+    exists = c.fetchone() is not None
+    try:
+        for statement in FTS_SCHEMA:
+            c.execute(statement)
+    except sqlite3.OperationalError as e:
+        logging.warning(f"⚠️ Chat search disabled, SQLite FTS5 unavailable: {e}")
+        return
+    if not exists:
+        # Index messages written before the search index existed
+        c.execute('''
+            INSERT INTO chat_history_fts (rowid, owner, user_message, ai_response, user_email, chat_id, timestamp)
+            SELECT id, 'u' || hex(lower(user_email)), user_message, ai_response, user_email, chat_id, timestamp
+            FROM chat_history
+            WHERE user_message IS NULL OR substr(user_message, 1, 7) != '[TITLE]'
+        ''')
+
+@timed("db.save_message")
 def save_message(user_email, chat_id, user_message=None, ai_response=None):
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
@@ -47,6 +112,7 @@ def save_message(user_email, chat_id, user_message=None, ai_response=None):
     conn.commit()
     conn.close()
 
+@timed("db.get_user_chats")
 def get_user_chats(user_email):
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
@@ -92,6 +158,7 @@ def get_user_chats(user_email):
     conn.close()
     return results
 
+@timed("db.get_chat_messages")
 def get_chat_messages(chat_id):
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
@@ -116,6 +183,7 @@ def get_chat_messages(chat_id):
             messages.append(("AI", ai_msg, ts))
     return messages
 
+@timed("db.delete_old_messages")
 def delete_old_messages(days=3):
     """Delete all messages older than `days` days"""
     conn = sqlite3.connect(DB_NAME)
@@ -127,6 +195,51 @@ def delete_old_messages(days=3):
     conn.commit()
     conn.close()
 
+def build_search_query(text):
+    """FTS5 MATCH expression for the words in `text`, or None if there is nothing to search."""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = " ".join(f'"{w}"' for w in words) + "*"  # prefix-match the last word while typing
+    return f'{{user_message ai_response}} : ({terms})'
+
+def _render_snippet(snippet):
+    """Escape message text, then turn the match markers into <mark> tags."""
+    if not snippet:
+        return None
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+@timed("db.search_messages")
+def search_messages(user_email, text, limit=20):
+    """Best-matching messages in the user's own chats, with highlighted snippets."""
+    match = build_search_query(text)
+    if not match:
+        return []
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('''
+        SELECT chat_id, timestamp,
+               snippet(chat_history_fts, 1, char(2), char(3), '…', 16),
+               snippet(chat_history_fts, 2, char(2), char(3), '…', 16)
+        FROM chat_history_fts
+        WHERE chat_history_fts MATCH ('owner : "u' || hex(lower(?)) || '" AND ' || ?)
+          AND user_email = ?
+        ORDER BY bm25(chat_history_fts, 0.0, 1.0, 1.0), timestamp DESC
+        LIMIT ?
+    ''', (user_email, match, user_email, max(1, min(limit, SEARCH_MAX_RESULTS))))
+    rows = c.fetchall()
+    conn.close()
+
+    results = []
+    for chat_id, ts, user_snippet, ai_snippet in rows:
+        results.append({
+            "chat_id": chat_id,
+            "timestamp": ts,
+            "user_message": _render_snippet(user_snippet) if user_snippet and "\x02" in user_snippet else None,
+            "ai_response": _render_snippet(ai_snippet) if ai_snippet and "\x02" in ai_snippet else None,
+        })
+    return results
+
 def delete_old_chats(user_email, limit=None):
     """Delete all chats older than `days` days for the user"""
     delete_old_messages(days=3)  # Enforce 3-day time limit
@@ -0,0 +1,81 @@
+"""
+Pluggable embedding backend for the HR knowledge base.
+
+EMBEDDING_BACKEND=openai (default) embeds through the OpenAI API.
+EMBEDDING_BACKEND=local runs a sentence-transformers model on the CPU, in
+batches, with torch's intra-op thread pool; no network is needed for
+indexing or querying. The backend identity is stored in the index manifest
+so an index is never queried with vectors from a different model.
+"""
+import os
+import threading
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))  # 0 = all cores
+
+# Indexes built before manifests recorded a backend were always built with OpenAI
+LEGACY_BACKEND_ID = "openai:text-embedding-ada-002"
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_sentence_model(name):
+    """Load a SentenceTransformer once per process and share it (also used by semantic_search)."""
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = _models[name] = SentenceTransformer(name, device="cpu")
+    return model
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain embeddings backed by a local sentence-transformers model."""
+
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads=LOCAL_EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = get_sentence_model(model_name)
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.model.encode(text, normalize_embeddings=True, convert_to_numpy=True).tolist()
+
+
+def backend_id(backend=None):
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "local":
+        return f"local:{LOCAL_EMBEDDING_MODEL}"
+    if backend == "openai":
+        return f"openai:{OPENAI_EMBEDDING_MODEL}"
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected 'openai' or 'local'")
+
+
+def get_embeddings(backend=None):
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "local":
+        return LocalEmbeddings()
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected 'openai' or 'local'")
@@ -2,11 +2,47 @@ import requests
 import os
 import time
 import logging
+import threading
+from contextlib import contextmanager
 from semantic_search import rank_files_by_similarity
 from msal_auth import load_token_cache, save_token_cache, build_msal_app
+from metrics import timer, timed, GRAPH_REQUESTS, GRAPH_THROTTLED
+import graph_scheduler
 
 logging.basicConfig(level=logging.INFO)
 
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+
+_call_count = threading.local()
+
+@contextmanager
+def counting_graph_calls():
+    """
+    Count the Graph HTTP requests made by this thread inside the block (retries included).
+    counter["complete"] is False if a search inside the block had to give up on part of its
+    fan-out (throttled, 5xx) or fell back to recent files, i.e. its results are not worth caching.
+    """
+    previous = getattr(_call_count, "value", None)
+    previous_incomplete = getattr(_call_count, "incomplete", False)
+    _call_count.value = 0
+    _call_count.incomplete = False
+    counter = {"calls": 0, "complete": True}
+    try:
+        yield counter
+    finally:
+        counter["calls"] = _call_count.value
+        counter["complete"] = not _call_count.incomplete
+        _call_count.value = previous if previous is None else previous + _call_count.value
+        _call_count.incomplete = previous_incomplete or _call_count.incomplete
+
+def _mark_incomplete(res, what):
+    """Record a failed fan-out step for counting_graph_calls. Returns True if `res` failed transiently."""
+    if res.status_code != 429 and res.status_code < 500:
+        return False
+    logging.warning(f"⚠️ {what} failed with {res.status_code}; search results are partial")
+    _call_count.incomplete = True
+    return True
+
 def refresh_token(account_id):
     cache = load_token_cache(account_id)
     app = build_msal_app(cache)
@@ -18,10 +54,19 @@ def refresh_token(account_id):
             return result["access_token"]
     return None
 
-def retry_request(url, headers, method="get", json=None, max_retries=2, account_id=None):
+def retry_request(url, headers, method="get", json=None, max_retries=2, account_id=None, request_class=None):
+    request_class = request_class or graph_scheduler.current_class()
     for i in range(max_retries + 1):
         try:
-            res = requests.request(method, url, headers=headers, json=json)
+            with graph_scheduler.slot(request_class) as granted:
+                if not granted:
+                    logging.warning(f"Graph scheduler busy, giving up on {url}")
+                    return graph_scheduler.busy_response(url)
+                with timer("graph_request"):
+                    res = requests.request(method, url, headers=headers, json=json)
+            GRAPH_REQUESTS.inc(status=res.status_code)
+            if getattr(_call_count, "value", None) is not None:
+                _call_count.value += 1
             if res.status_code == 401 and account_id:
                 logging.warning("Received 401 Unauthorized. Attempting token refresh...")
                 token = refresh_token(account_id)
@@ -29,9 +74,14 @@ def retry_request(url, headers, method="get", json=None, max_retries=2, account_
                     headers["Authorization"] = f"Bearer {token}"
                     continue  # retry with new token
             elif res.status_code == 429:
+                GRAPH_THROTTLED.inc()
                 retry_after = int(res.headers.get("Retry-After", 5))
                 logging.warning(f"Rate limited on {url}. Retrying after {retry_after} seconds...")
-                time.sleep(retry_after)
+                if graph_scheduler.GRAPH_SCHEDULER:
+                    # Every worker holds back; the retry waits for its slot like everyone else
+                    graph_scheduler.pause(request_class, retry_after)
+                else:
+                    time.sleep(retry_after)
             else:
                 logging.info(f"Request to {url} returned status {res.status_code}")
                 return res
@@ -59,46 +109,70 @@ def get_user_email(account_id):
     if not token:
         return None
     headers = {"Authorization": f"Bearer {token}"}
-    res = retry_request("https://graph.microsoft.com/v1.0/me", headers)
+    res = retry_request(f"{GRAPH_BASE_URL}/me", headers)
     if res.status_code == 200:
         return res.json().get("mail") or res.json().get("userPrincipalName")
     return None
 
-def search_all_files(token, query):
+@timed("search_all_files")
+def search_all_files(token, query, cancel_event=None):
     headers = {"Authorization": f"Bearer {token}"}
     all_results = []
 
-    me_url = f"https://graph.microsoft.com/v1.0/me/drive/root/search(q='{query}')"
+    def cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            logging.info(f"Search for '{query}' cancelled")
+            return True
+        return False
+
+    me_url = f"{GRAPH_BASE_URL}/me/drive/root/search(q='{query}')"
     me_res = retry_request(me_url, headers)
     if me_res.status_code == 200:
         all_results += tag_site_id(me_res.json().get("value", []), "personal")
+    else:
+        _mark_incomplete(me_res, "OneDrive search")
 
-    sites_url = "https://graph.microsoft.com/v1.0/sites?search=*"
+    sites_url = f"{GRAPH_BASE_URL}/sites?search=*"
     while sites_url:
+        if cancelled():
+            return []
         res = retry_request(sites_url, headers)
         if res.status_code != 200:
             logging.error(f"Failed to retrieve sites: {res.status_code}")
+            _mark_incomplete(res, "Sites listing")
             break
         for site in res.json().get("value", []):
             site_id = site["id"]
-            drives_res = retry_request(f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives", headers)
+            drives_res = retry_request(f"{GRAPH_BASE_URL}/sites/{site_id}/drives", headers)
             if drives_res.status_code == 200:
                 for drive in drives_res.json().get("value", []):
-                    search_url = f"https://graph.microsoft.com/v1.0/drives/{drive['id']}/search(q='{query}')"
+                    if cancelled():
+                        return []
+                    search_url = f"{GRAPH_BASE_URL}/drives/{drive['id']}/search(q='{query}')"
                     search_res = retry_request(search_url, headers)
                     if search_res.status_code == 200:
                         all_results += tag_site_id(search_res.json().get("value", []), site_id)
+                    else:
+                        _mark_incomplete(search_res, "Drive search")
+            else:
+                _mark_incomplete(drives_res, "Drives listing")
         sites_url = res.json().get("@odata.nextLink")
 
+    if cancelled():
+        return []
+
     if not all_results:
         logging.info("No results found via search. Fetching recent files as fallback.")
+        # Recent files are not an answer to this query; never cache them as one
+        _call_count.incomplete = True
         all_results = fetch_recent_files(token)
 
     return rank_files_by_similarity(query, all_results, top_k=5)
 
+@timed("fetch_recent_files")
 def fetch_recent_files(token):
     headers = {"Authorization": f"Bearer {token}"}
-    res = retry_request("https://graph.microsoft.com/v1.0/me/drive/recent", headers)
+    res = retry_request(f"{GRAPH_BASE_URL}/me/drive/recent", headers)
     if res.status_code == 200:
         return tag_site_id(res.json().get("value", []), "personal")
     return []
@@ -110,14 +184,15 @@ def tag_site_id(items, site_id):
         item["parentReference"]["siteId"] = site_id
     return items
 
+@timed("check_file_access")
 def check_file_access(token, item_id, user_email, site_id=None):
     headers = {"Authorization": f"Bearer {token}"}
     urls = [
-        f"https://graph.microsoft.com/v1.0/me/drive/items/{item_id}/permissions",
-        f"https://graph.microsoft.com/v1.0/users/{user_email}/drive/items/{item_id}/permissions"
+        f"{GRAPH_BASE_URL}/me/drive/items/{item_id}/permissions",
+        f"{GRAPH_BASE_URL}/users/{user_email}/drive/items/{item_id}/permissions"
     ]
     if site_id and site_id != "personal":
-        urls.append(f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive/items/{item_id}/permissions")
+        urls.append(f"{GRAPH_BASE_URL}/sites/{site_id}/drive/items/{item_id}/permissions")
 
     for url in urls:
         try:
@@ -139,6 +214,7 @@ def send_multiple_file_email(token, to_email, files):
     links = "".join(f"<p><a href='{f['webUrl']}'>{f['name']}</a></p>" for f in files)
     return send_email(token, to_email, "Your requested files", f"<p>Here are the files you requested:</p>{links}")
 
+@timed("send_mail")
 def send_email(token, to_email, subject, html_content):
     headers = {
         "Authorization": f"Bearer {token}",
@@ -158,10 +234,11 @@ def send_email(token, to_email, subject, html_content):
 
     try:
         res = retry_request(
-            "https://graph.microsoft.com/v1.0/me/sendMail",
+            f"{GRAPH_BASE_URL}/me/sendMail",
             headers,
             method="post",
-            json=message
+            json=message,
+            request_class="email"
         )
         if res.status_code == 202:
             logging.info(f"✅ Email sent to {to_email}")
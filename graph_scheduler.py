@@ -0,0 +1,200 @@
+"""
+Tenant-wide scheduling of outbound Microsoft Graph requests.
+
+Graph throttles the whole app/tenant, so limits are kept in a small SQLite
+file shared by every worker on the host (GRAPH_SCHEDULER_DB):
+
+  * a token bucket (GRAPH_RATE_PER_SEC, GRAPH_BURST) shared by all requests;
+  * concurrency caps, global and per request class, as expiring leases so a
+    crashed worker cannot hold slots forever;
+  * pauses: a 429's Retry-After stops that class (and every lower-priority
+    class) for all workers, instead of one thread sleeping while the rest
+    keep hitting Graph.
+
+Request classes, highest priority first: "interactive" (a user waiting on a
+search or permission check), "background" (cache refreshes, crawls) and
+"email". Lower classes may not dip into the last GRAPH_INTERACTIVE_RESERVE
+fraction of the bucket or the concurrency cap, so user searches get through
+even when background work is queued.
+
+GRAPH_SCHEDULER=0 restores the old per-call sleep on 429. If the state file
+cannot be used, requests are let through rather than blocked.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+import requests
+
+from metrics import GRAPH_SCHEDULER_WAIT, GRAPH_PAUSES
+
+GRAPH_SCHEDULER = os.getenv("GRAPH_SCHEDULER", "1") != "0"
+GRAPH_SCHEDULER_DB = os.getenv("GRAPH_SCHEDULER_DB", "graph_scheduler.db")
+GRAPH_RATE_PER_SEC = float(os.getenv("GRAPH_RATE_PER_SEC", "20"))
+GRAPH_BURST = float(os.getenv("GRAPH_BURST", "40"))
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "16"))
+GRAPH_BACKGROUND_CONCURRENCY = int(os.getenv("GRAPH_BACKGROUND_CONCURRENCY", "4"))
+GRAPH_EMAIL_CONCURRENCY = int(os.getenv("GRAPH_EMAIL_CONCURRENCY", "2"))
+GRAPH_INTERACTIVE_RESERVE = float(os.getenv("GRAPH_INTERACTIVE_RESERVE", "0.25"))
+GRAPH_MAX_WAIT = float(os.getenv("GRAPH_MAX_WAIT", "30"))
+GRAPH_LEASE_SECONDS = float(os.getenv("GRAPH_LEASE_SECONDS", "120"))
+
+PRIORITY = ("interactive", "background", "email")
+CLASS_CONCURRENCY = {
+    "interactive": GRAPH_MAX_CONCURRENCY,
+    "background": GRAPH_BACKGROUND_CONCURRENCY,
+    "email": GRAPH_EMAIL_CONCURRENCY,
+}
+POLL_SECONDS = 0.02
+MAX_SLEEP_SECONDS = 0.25
+
+_local = threading.local()
+
+
+@contextmanager
+def request_class(name):
+    """Run Graph calls made by this thread inside the block under `name`."""
+    if name not in PRIORITY:
+        raise ValueError(f"Unknown Graph request class '{name}', expected one of {PRIORITY}")
+    previous = getattr(_local, "request_class", None)
+    _local.request_class = name
+    try:
+        yield
+    finally:
+        _local.request_class = previous
+
+
+def current_class():
+    return getattr(_local, "request_class", None) or "interactive"
+
+
+def _connect():
+    # One connection per thread and process; gunicorn forks must not share one
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(GRAPH_SCHEDULER_DB, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL, updated REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS pauses (request_class TEXT PRIMARY KEY, until REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY AUTOINCREMENT, request_class TEXT, pid INTEGER, expires REAL)")
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def _try_acquire(conn, cls, now):
+    """One scheduling attempt. Returns (lease_id, None) or (None, seconds to wait)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+
+        row = conn.execute("SELECT until FROM pauses WHERE request_class = ?", (cls,)).fetchone()
+        if row and row[0] > now:
+            conn.execute("COMMIT")
+            return None, row[0] - now
+
+        total = conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+        mine = conn.execute("SELECT COUNT(*) FROM leases WHERE request_class = ?", (cls,)).fetchone()[0]
+        reserved = cls != "interactive"
+        total_cap = GRAPH_MAX_CONCURRENCY * (1 - GRAPH_INTERACTIVE_RESERVE) if reserved else GRAPH_MAX_CONCURRENCY
+        if total >= max(1, total_cap) or mine >= CLASS_CONCURRENCY[cls]:
+            conn.execute("COMMIT")
+            return None, POLL_SECONDS
+
+        row = conn.execute("SELECT tokens, updated FROM bucket WHERE id = 0").fetchone()
+        tokens, updated = row if row else (GRAPH_BURST, now)
+        tokens = min(GRAPH_BURST, tokens + max(0.0, now - updated) * GRAPH_RATE_PER_SEC)
+        floor = GRAPH_BURST * GRAPH_INTERACTIVE_RESERVE if reserved else 0.0
+        if tokens - 1 < floor:
+            conn.execute("INSERT OR REPLACE INTO bucket (id, tokens, updated) VALUES (0, ?, ?)", (tokens, now))
+            conn.execute("COMMIT")
+            return None, max(POLL_SECONDS, (floor + 1 - tokens) / GRAPH_RATE_PER_SEC)
+
+        conn.execute("INSERT OR REPLACE INTO bucket (id, tokens, updated) VALUES (0, ?, ?)", (tokens - 1, now))
+        lease = conn.execute(
+            "INSERT INTO leases (request_class, pid, expires) VALUES (?, ?, ?)",
+            (cls, os.getpid(), now + GRAPH_LEASE_SECONDS),
+        ).lastrowid
+        conn.execute("COMMIT")
+        return lease, None
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _release(lease):
+    try:
+        _connect().execute("DELETE FROM leases WHERE id = ?", (lease,))
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ Could not release Graph lease {lease}: {e}")
+
+
+@contextmanager
+def slot(cls=None, max_wait=GRAPH_MAX_WAIT):
+    """
+    Wait for permission to send one Graph request of class `cls`.
+    Yields True when granted, False if it could not be granted within max_wait.
+    """
+    cls = cls or current_class()
+    if not GRAPH_SCHEDULER:
+        yield True
+        return
+
+    start = time.time()
+    lease = None
+    while True:
+        now = time.time()
+        try:
+            lease, wait = _try_acquire(_connect(), cls, now)
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ Graph scheduler unavailable, sending {cls} request unscheduled: {e}")
+            GRAPH_SCHEDULER_WAIT.observe(now - start, request_class=cls, outcome="unscheduled")
+            yield True
+            return
+        if lease is not None:
+            GRAPH_SCHEDULER_WAIT.observe(now - start, request_class=cls, outcome="granted")
+            break
+        remaining = start + max_wait - now
+        if remaining <= 0:
+            GRAPH_SCHEDULER_WAIT.observe(now - start, request_class=cls, outcome="timeout")
+            yield False
+            return
+        time.sleep(min(wait, remaining, MAX_SLEEP_SECONDS))
+
+    try:
+        yield True
+    finally:
+        _release(lease)
+
+
+def pause(cls, seconds):
+    """Hold back `cls` and every lower-priority class, in all workers, for `seconds`."""
+    cls = cls or current_class()
+    until = time.time() + seconds
+    GRAPH_PAUSES.inc(request_class=cls)
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        for name in PRIORITY[PRIORITY.index(cls):]:
+            conn.execute(
+                "INSERT INTO pauses (request_class, until) VALUES (?, ?) "
+                "ON CONFLICT(request_class) DO UPDATE SET until = MAX(until, excluded.until)",
+                (name, until),
+            )
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ Could not record Graph pause for {cls}; sleeping locally: {e}")
+        time.sleep(seconds)
+
+
+def busy_response(url, retry_after=GRAPH_MAX_WAIT):
+    """Local stand-in for a 429, returned when no slot was granted in time."""
+    res = requests.Response()
+    res.status_code = 429
+    res.url = url
+    res.headers["Retry-After"] = str(int(retry_after))
+    res._content = b'{"error": {"code": "TooManyRequests", "message": "Graph scheduler queue timeout"}}'
+    return res
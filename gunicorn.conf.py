@@ -0,0 +1,47 @@
+"""
+gunicorn settings (picked up automatically from the working directory).
+
+Nothing here changes a normal deployment: bind address, workers, threads
+and timeout come from the command line or gunicorn's defaults as before.
+GUNICORN_MEMORY_MODE=1 opts into the memory-efficient mode:
+
+preload_app imports app.py once in the master, so the MiniLM model, the
+local embedding model (EMBEDDING_BACKEND=local) and the HR vector store are
+loaded before fork and shared copy-on-write by every worker. The FAISS index
+itself is memory-mapped read-only, so its pages live in the shared page
+cache. The mode also sets the topology below (4 workers x 4 threads unless
+GUNICORN_WORKERS / GUNICORN_THREADS say otherwise). Check the effect with
+`python -m benchmarks.worker_memory` or the docufind_process_memory_bytes
+series on /metrics.
+"""
+import os
+import gc
+
+memory_mode = os.getenv("GUNICORN_MEMORY_MODE", "0") == "1"
+
+if memory_mode:
+    preload_app = True
+    bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+    workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+    timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers are forked
+    if not memory_mode:
+        return
+    import hr_router
+    hr_router.preload()
+    # Move everything allocated so far out of the GC's reach: collections in the
+    # workers would otherwise write to these objects' headers and un-share their pages
+    gc.freeze()
+    server.log.info(f"Preloaded app, {gc.get_freeze_count()} objects frozen before fork")
+
+
+def post_fork(server, worker):
+    # Don't share the master's pooled SQLite connection (opened by create_all at import)
+    if not memory_mode:
+        return
+    import msal_auth
+    msal_auth.engine.dispose(close=False)
@@ -0,0 +1,128 @@
+"""
+HR document store helpers: uploader metadata, content hashes and bounded
+streaming of uploads to disk.
+
+index_metadata.json maps filename -> {uploader, timestamp, sha256}. It is
+rewritten atomically (temp file + os.replace) under an exclusive file lock,
+so concurrent uploads from different workers cannot lose each other's
+entries and readers never see a half-written file. Hold the lock only for
+the metadata update itself: it blocks uploads and deletes in every worker.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from knowledge_base.build_index import DOCUMENTS_PATH
+
+# The directory build_index reads (HR_DOCUMENTS_PATH), with the metadata kept beside it
+DOCS_DIR = DOCUMENTS_PATH
+METADATA_PATH = os.path.join(os.path.dirname(DOCS_DIR), "index_metadata.json")
+ALLOWED_EXTS = (".pdf", ".docx", ".txt")
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def load_metadata(path=METADATA_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_metadata(metadata, path=METADATA_PATH):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".index_metadata-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _lock(f):
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # retries for ~10s, then raises OSError
+
+
+def _unlock(f):
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def metadata_transaction(path=METADATA_PATH):
+    """Yield the metadata dict with an exclusive lock held; it is saved if the block succeeds."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a+") as lock:
+        _lock(lock)
+        try:
+            metadata = load_metadata(path)
+            yield metadata
+            save_metadata(metadata, path)
+        finally:
+            _unlock(lock)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def indexed_hashes(metadata, docs_dir=DOCS_DIR):
+    """sha256 -> filename for every document on disk. Missing hashes are computed and stored in `metadata`."""
+    hashes = {}
+    if not os.path.isdir(docs_dir):
+        return hashes
+    for fname in os.listdir(docs_dir):
+        fpath = os.path.join(docs_dir, fname)
+        if not os.path.isfile(fpath):
+            continue
+        entry = metadata.setdefault(fname, {"uploader": "unknown"})
+        if not entry.get("sha256"):
+            try:
+                entry["sha256"] = file_sha256(fpath)
+            except OSError as e:
+                logging.warning(f"⚠️ Could not hash {fname}: {e}")
+                continue
+        hashes[entry["sha256"]] = fname
+    return hashes
+
+
+def stream_to_file(src, dest_path, max_bytes):
+    """Copy a file-like object to dest_path in chunks, hashing as it goes. Returns (sha256, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest(), size
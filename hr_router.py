@@ -1,16 +1,28 @@
 import os
-from openai import OpenAI
+import pickle
+import logging
+import threading
+import faiss
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+from knowledge_base.build_index import INDEX_PATH, read_manifest, current_index_dir
+from embedding_backend import get_embeddings, backend_id, LEGACY_BACKEND_ID
+from knowledge_base.index_types import apply_search_params
+from metrics import timed, HR_CONTEXT_TOKENS
+from context_packing import pack_context, HR_CONTEXT_CANDIDATES
+from llm_gateway import chat_completion
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Process-wide vector store, loaded once (before fork under gunicorn --preload)
+_store_lock = threading.Lock()
+_store = None
+_store_key = None
+_store_backend = None
 
+@timed("classify_intent")
 def classify_intent(user_query):
-    """Use ChatGPT to classify the user's intent."""
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
+    """Use ChatGPT to classify the user's intent (temperature 0, so answers are cached)."""
+    content = chat_completion(
+        "gpt-4",
+        [
             {
                 "role": "system",
                 "content": "Classify the user query as one of: HR_Admin, File_Operation, Email_Operation, General."
@@ -22,32 +34,86 @@ def classify_intent(user_query):
         ],
         temperature=0
     )
-    return response.choices[0].message.content.strip()
+    return content.strip()
 
-def search_hr_knowledge_base(user_query):
-    """Search the FAISS index for HR/Admin-related answers."""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    index_path = os.path.join(base_path, "knowledge_base", "faiss_index")
+def _index_key(index_path):
+    try:
+        st = os.stat(os.path.join(index_path, "index.faiss"))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def load_vector_store(index_path, embeddings):
+    """
+    Open a saved index read-only and memory-mapped so gunicorn workers share
+    its pages through the page cache instead of each holding a private copy.
+    """
     faiss_file = os.path.join(index_path, "index.faiss")
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        index = faiss.read_index(faiss_file, flags)
+    except RuntimeError as e:
+        logging.warning(f"⚠️ Memory-mapped FAISS load failed ({e}); reading index into memory")
+        index = faiss.read_index(faiss_file)
+    apply_search_params(index)
+
+    with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+def get_vector_store():
+    """Return (vector_store, embedding backend it was built with); reloads after build_index publishes."""
+    global _store, _store_key, _store_backend
+    # Resolve the published version once and read every file from it: versions are never rewritten
+    index_dir = current_index_dir(INDEX_PATH)
+    key = _index_key(index_dir)
+    if key is None:
+        return None, None
+    key = (index_dir,) + key
+    if key == _store_key:
+        return _store, _store_backend
 
-    if not os.path.exists(faiss_file):
+    with _store_lock:
+        if key != _store_key:
+            built_with = read_manifest(index_dir).get("embedding_backend", LEGACY_BACKEND_ID)
+            store = load_vector_store(index_dir, get_embeddings())
+            _store, _store_key, _store_backend = store, key, built_with
+    return _store, _store_backend
+
+def preload():
+    """Load the HR index (and a local embedding model, if configured) ahead of the first query."""
+    try:
+        store, built_with = get_vector_store()
+        if store is not None:
+            logging.info(f"📚 HR index preloaded: {store.index.ntotal} chunks ({built_with})")
+    except Exception as e:
+        logging.warning(f"⚠️ HR index preload failed: {e}")
+
+@timed("search_hr_knowledge_base")
+def search_hr_knowledge_base(user_query):
+    """Search the FAISS index for HR/Admin-related answers."""
+    vector_store, built_with = get_vector_store()
+    if vector_store is None:
         return "Knowledge base not found."
 
-    embeddings = OpenAIEmbeddings()
-    vector_store = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    if built_with != backend_id():
+        logging.error(f"❌ HR index was built with {built_with} but {backend_id()} is configured")
+        return "Knowledge base index was built with a different embedding model. Please ask HR to rebuild it."
 
-    results = vector_store.similarity_search(user_query, k=3)
+    results = vector_store.similarity_search_with_score(user_query, k=HR_CONTEXT_CANDIDATES)
     if not results:
         return "No relevant information found."
 
-    context = "\n\n".join([doc.page_content for doc in results])
+    context, stats = pack_context(results)
+    HR_CONTEXT_TOKENS.observe(stats["tokens"])
     return context
 
+@timed("generate_answer")
 def generate_answer_from_context(user_query, context):
     """Generate a helpful response using context and ChatGPT."""
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
+    content = chat_completion(
+        "gpt-4",
+        [
             {
                 "role": "system",
                 "content": "You are an HR assistant. Use the following context to answer the user's question."
@@ -59,16 +125,20 @@ def generate_answer_from_context(user_query, context):
         ],
         temperature=0.2
     )
-    return response.choices[0].message.content.strip()
+    return content.strip()
+
+def answer_hr_query(user_query):
+    """Answer a query already classified as HR_Admin from the knowledge base."""
+    context = search_hr_knowledge_base(user_query)
+    if context.startswith("Knowledge base") or context.startswith("No relevant"):
+        return context
+    return generate_answer_from_context(user_query, context)
 
 def handle_query(user_query):
     """Route queries based on classified intent."""
     intent = classify_intent(user_query)
 
     if intent == "HR_Admin":
-        context = search_hr_knowledge_base(user_query)
-        if context.startswith("Knowledge base") or context.startswith("No relevant"):
-            return context
-        return generate_answer_from_context(user_query, context)
+        return answer_hr_query(user_query)
 
     return None  # Let app.py handle non-HR queries
@@ -1,16 +1,34 @@
 import os
+import sys
+import json
+import shutil
+import tempfile
+from datetime import datetime
+import numpy as np
 from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # allow `python knowledge_base/build_index.py`
+from metrics import timed
+from embedding_backend import get_embeddings, backend_id
+from knowledge_base.index_types import FAISS_INDEX_TYPE, FAISS_TRAIN_SAMPLE, create_index, train_index
+
 load_dotenv()  # Loads OPENAI_API_KEY
 
 # ✅ Absolute paths based on current file location
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCUMENTS_PATH = os.path.join(BASE_DIR, "documents")
-INDEX_PATH = os.path.join(BASE_DIR, "faiss_index")
+DOCUMENTS_PATH = os.getenv("HR_DOCUMENTS_PATH", os.path.join(BASE_DIR, "documents"))
+INDEX_PATH = os.getenv("HR_INDEX_PATH", os.path.join(BASE_DIR, "faiss_index"))
+MANIFEST_NAME = "manifest.json"
+# Each build is published as INDEX_PATH/versions/<name>/ and CURRENT_LINK is swapped to point at it.
+# CURRENT_LINK is a symlink, or a one-line file naming the version where symlinks
+# are unavailable (Windows without developer mode).
+VERSIONS_DIR = "versions"
+CURRENT_LINK = "current"
+INDEX_KEEP_VERSIONS = int(os.getenv("HR_INDEX_KEEP_VERSIONS", "3"))
 
 def load_documents(directory):
     docs = []
@@ -38,6 +56,98 @@ def load_documents(directory):
             print(f"❌ Failed to load {file}: {e}")
     return docs
 
+def build_trained_store(texts, embeddings, index_type):
+    """Embed chunks, train an approximate index on a sample, then add every chunk."""
+    vectors = np.array(embeddings.embed_documents([t.page_content for t in texts]), dtype="float32")
+    index, params = create_index(index_type, vectors.shape[1], len(vectors))
+    if not index.is_trained:
+        print(f"🏋️ Training {params['index_type']} index on up to {FAISS_TRAIN_SAMPLE} vectors...")
+        train_index(index, vectors)
+
+    db = FAISS(embedding_function=embeddings, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+    db.add_embeddings(
+        list(zip([t.page_content for t in texts], vectors.tolist())),
+        metadatas=[t.metadata for t in texts],
+    )
+    return db, params
+
+def write_manifest(params, chunk_count, dim, index_path=INDEX_PATH):
+    manifest = dict(params)
+    manifest.update({
+        "embedding_backend": backend_id(),
+        "dim": dim,
+        "chunks": chunk_count,
+        "built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    with open(os.path.join(index_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def publish_index(db, params, chunk_count):
+    """
+    Save into a fresh version directory and atomically swap the CURRENT_LINK
+    symlink to it, so a reader always sees index.faiss, index.pkl and the
+    manifest of the same build. Published versions are never rewritten:
+    workers memory-map index.faiss, and older versions are only deleted once
+    they are INDEX_KEEP_VERSIONS builds old.
+    """
+    versions = os.path.join(INDEX_PATH, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    version_dir = tempfile.mkdtemp(prefix=f"{stamp}-", dir=versions)
+    try:
+        db.save_local(version_dir)
+        write_manifest(params, chunk_count, db.index.d, version_dir)
+        os.chmod(version_dir, 0o755)
+        point_current(os.path.join(VERSIONS_DIR, os.path.basename(version_dir)))
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    prune_versions(version_dir)
+    return version_dir
+
+def point_current(target, index_path=INDEX_PATH):
+    """Atomically point CURRENT_LINK at `target` (relative to index_path)."""
+    link_tmp = os.path.join(index_path, f".{CURRENT_LINK}-{os.getpid()}")
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    try:
+        os.symlink(target, link_tmp)
+    except (OSError, NotImplementedError):
+        with open(link_tmp, "w") as f:
+            f.write(target)
+    os.replace(link_tmp, os.path.join(index_path, CURRENT_LINK))
+
+def prune_versions(keep_dir):
+    versions = os.path.join(INDEX_PATH, VERSIONS_DIR)
+    old = sorted(
+        (os.path.join(versions, name) for name in os.listdir(versions)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in old[INDEX_KEEP_VERSIONS:]:
+        if os.path.samefile(path, keep_dir):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+def current_index_dir(index_path=INDEX_PATH):
+    """Directory of the published build; indexes saved before versioning live in index_path itself."""
+    link = os.path.join(index_path, CURRENT_LINK)
+    if not os.path.lexists(link):
+        return index_path
+    if os.path.islink(link):
+        return os.path.join(index_path, os.readlink(link))
+    with open(link, "r") as f:
+        return os.path.join(index_path, f.read().strip())
+
+def read_manifest(index_path=INDEX_PATH):
+    path = os.path.join(index_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+@timed("build_index")
 def build_index():
     print(f"🔄 Loading documents from: {DOCUMENTS_PATH}")
     documents = load_documents(DOCUMENTS_PATH)
@@ -47,16 +157,20 @@ def build_index():
         return
 
     print(f"✅ Loaded {len(documents)} documents. Splitting into chunks...")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100, add_start_index=True)
     texts = splitter.split_documents(documents)
     print(f"🧩 Split into {len(texts)} text chunks.")
 
-    print("🔄 Creating vector embeddings...")
-    embeddings = OpenAIEmbeddings()
-    db = FAISS.from_documents(texts, embeddings)
+    print(f"🔄 Creating vector embeddings with {backend_id()} ({FAISS_INDEX_TYPE} index)...")
+    embeddings = get_embeddings()
+    if FAISS_INDEX_TYPE == "flat":
+        db = FAISS.from_documents(texts, embeddings)
+        params = {"index_type": "flat"}
+    else:
+        db, params = build_trained_store(texts, embeddings, FAISS_INDEX_TYPE)
 
     print(f"💾 Saving FAISS index to: {INDEX_PATH}")
-    db.save_local(INDEX_PATH)
+    publish_index(db, params, len(texts))
     print("✅ Index built and saved successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+import os
+import math
+import logging
+import numpy as np
+import faiss
+
+# flat   exact brute-force scan (default, best for a few thousand chunks)
+# ivf    inverted lists over k-means cells, scans FAISS_NPROBE cells per query
+# hnsw   graph search, fast and accurate but ~1.5x the memory of flat
+# pq     product-quantized codes, ~dim/FAISS_PQ_M times smaller, approximate distances
+# ivfpq  ivf + pq, for very large knowledge bases
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "ivfpq")
+
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0 = derive from the number of chunks
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "0"))  # 0 = largest divisor of dim <= 64
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+
+PQ_NBITS = 8
+MIN_POINTS_PER_CENTROID = 39  # below this faiss k-means warns and clusters badly
+
+
+def default_nlist(n_vectors):
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def default_pq_m(dim):
+    return max(m for m in range(1, min(dim, 64) + 1) if dim % m == 0)
+
+
+def min_training_points(index_type, nlist):
+    if index_type == "ivf":
+        return nlist * MIN_POINTS_PER_CENTROID
+    if index_type == "pq":
+        return 2 ** PQ_NBITS
+    if index_type == "ivfpq":
+        return max(nlist * MIN_POINTS_PER_CENTROID, 2 ** PQ_NBITS)
+    return 0
+
+
+def create_index(index_type, dim, n_vectors, nlist=None, hnsw_m=None, pq_m=None):
+    """
+    Create an empty (possibly untrained) L2 index of `index_type`.
+    Falls back to flat when there are too few vectors to train the requested type.
+    Returns (index, params) where params records what was actually built.
+    """
+    index_type = index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+    nlist = nlist or FAISS_NLIST or default_nlist(n_vectors)
+    pq_m = pq_m or FAISS_PQ_M or default_pq_m(dim)
+    hnsw_m = hnsw_m or FAISS_HNSW_M
+
+    needed = min_training_points(index_type, nlist)
+    if n_vectors < needed:
+        logging.warning(f"⚠️ {n_vectors} vectors are too few to train a '{index_type}' index (need {needed}). Using flat.")
+        index_type = "flat"
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim), {"index_type": "flat"}
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        return index, {"index_type": "hnsw", "hnsw_m": hnsw_m, "ef_search": FAISS_HNSW_EF_SEARCH}
+    if index_type == "pq":
+        return faiss.IndexPQ(dim, pq_m, PQ_NBITS), {"index_type": "pq", "pq_m": pq_m}
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        params = {"index_type": "ivf", "nlist": nlist}
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, PQ_NBITS)
+        params = {"index_type": "ivfpq", "nlist": nlist, "pq_m": pq_m}
+    index.nprobe = min(FAISS_NPROBE, nlist)
+    params["nprobe"] = index.nprobe
+    return index, params
+
+
+def train_index(index, vectors, sample_size=None, seed=0):
+    """Train `index` on a random sample of `vectors` (float32 array) if it needs training."""
+    if index.is_trained:
+        return
+    sample_size = sample_size or FAISS_TRAIN_SAMPLE
+    if len(vectors) > sample_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+
+def apply_search_params(index):
+    """Apply runtime search knobs (FAISS_NPROBE / FAISS_HNSW_EF_SEARCH) to a loaded index."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(FAISS_NPROBE, ivf.nlist)
+        return
+    except Exception:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+
+
+def index_memory_bytes(index):
+    """Serialized size, a close proxy for resident size of the vectors/codes and structures."""
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,251 @@
+"""
+Single entry point for OpenAI chat completions (used by openai_api and hr_router).
+
+Every call goes through the same path:
+
+  1. cache      temperature-0 calls (e.g. classify_intent) are answered from a
+                per-process LRU, then from a SQLite cache shared by all workers
+                (LLM_CACHE_DB, entries expire after LLM_CACHE_TTL seconds);
+  2. coalesce   cacheable prompts already in flight wait for that call's
+                result instead of sending their own (single-flight). Calls
+                that are not cacheable (temperature > 0) always get their own
+                completion, so two users never share a sampled answer;
+  3. limit      at most LLM_MAX_CONCURRENCY calls per process hold a slot,
+                and a caller waits up to LLM_QUEUE_TIMEOUT for one;
+  4. deadline   each call has a timeout (LLM_TIMEOUT). A timeout, rate limit,
+                connection error or 5xx retries once on LLM_FALLBACK_MODEL
+                (answers from the fallback model are never cached).
+
+The OpenAI client's own retries are off by default (LLM_MAX_RETRIES=0; the
+SDK default is 2): each retry would restart the timeout, so a stuck model
+could hold a slot for three deadlines before the fallback is tried.
+
+Requests, tokens, latency, cache lookups, coalesced calls and fallbacks are
+exported through metrics.py. For tests and benchmarks, point OPENAI_BASE_URL
+at benchmarks.fakes.FakeOpenAIServer
+(`python -m benchmarks.fakes openai --port 8001`).
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import openai
+from dotenv import load_dotenv
+
+from metrics import (
+    record_llm_usage,
+    LLM_SECONDS,
+    LLM_QUEUE_SECONDS,
+    LLM_CACHE_LOOKUPS,
+    LLM_COALESCED,
+    LLM_FALLBACKS,
+)
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-4o-mini")
+LLM_FALLBACK_TIMEOUT = float(os.getenv("LLM_FALLBACK_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))  # see the module docstring
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+
+# Errors worth retrying on the fallback model; anything else (bad request, auth) is raised as-is
+FALLBACK_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+# What the chat shows when no answer could be produced in time
+BUSY_REPLY = "⚠️ I'm having trouble answering that. Please try again later."
+
+
+class LLMBusy(Exception):
+    """No concurrency slot became free within LLM_QUEUE_TIMEOUT."""
+
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+def get_client():
+    # Created lazily so each gunicorn worker opens its own HTTP connection pool
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=LLM_MAX_RETRIES)
+    return _client
+
+
+class ResponseCache:
+    """LRU in front of a SQLite table, so a cached answer survives restarts and is shared by workers."""
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE, db_path=LLM_CACHE_DB, ttl=LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, content TEXT, created REAL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _remember(self, key, content, created):
+        with self._lock:
+            self._entries[key] = (content, created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                LLM_CACHE_LOOKUPS.inc(result="memory")
+                return entry[0]
+        try:
+            row = self._connect().execute(
+                "SELECT content, created FROM llm_cache WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ LLM disk cache read failed: {e}")
+            row = None
+        if row is None:
+            LLM_CACHE_LOOKUPS.inc(result="miss")
+            return None
+        LLM_CACHE_LOOKUPS.inc(result="disk")
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        self._remember(key, content, now)
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, content, created) VALUES (?, ?, ?)", (key, content, now))
+            conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ LLM disk cache write failed: {e}")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_cache = ResponseCache()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _request_key(model, messages, temperature):
+    payload = json.dumps({"model": model, "messages": messages, "temperature": temperature}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _create(model, messages, temperature, timeout):
+    start = time.perf_counter()
+    try:
+        response = get_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature, timeout=timeout
+        )
+    except Exception as e:
+        outcome = "timeout" if isinstance(e, openai.APITimeoutError) else "error"
+        LLM_SECONDS.observe(time.perf_counter() - start, model=model, outcome=outcome)
+        record_llm_usage(model, outcome=outcome)
+        raise
+    LLM_SECONDS.observe(time.perf_counter() - start, model=model, outcome="ok")
+    record_llm_usage(model, response)
+    return response.choices[0].message.content
+
+
+def _call(model, messages, temperature, timeout, fallback_model):
+    """Returns (content, answered by the requested model)."""
+    queued = time.perf_counter()
+    if not _slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued, outcome="timeout")
+        raise LLMBusy(f"No LLM slot free after {LLM_QUEUE_TIMEOUT:.0f}s")
+    LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued, outcome="granted")
+    try:
+        try:
+            return _create(model, messages, temperature, timeout), True
+        except FALLBACK_ERRORS as e:
+            if not fallback_model or fallback_model == model:
+                raise
+            LLM_FALLBACKS.inc(model=model, reason=type(e).__name__)
+            logging.warning(f"⚠️ {model} failed ({type(e).__name__}); retrying on {fallback_model}")
+            return _create(fallback_model, messages, temperature, LLM_FALLBACK_TIMEOUT), False
+    finally:
+        _slots.release()
+
+
+def chat_completion(model, messages, temperature=0, timeout=None, cache=None, fallback_model=LLM_FALLBACK_MODEL):
+    """
+    Reply text for a chat completion. `cache` defaults to True for temperature-0 calls;
+    only cacheable calls are stored (unless LLM_CACHE=0) and coalesced with identical
+    in-flight calls. Pass fallback_model=None to fail instead of degrading to a faster model.
+    """
+    timeout = timeout or LLM_TIMEOUT
+    cacheable = temperature == 0 if cache is None else cache
+    if not cacheable:
+        content, _ = _call(model, messages, temperature, timeout, fallback_model)
+        return content
+
+    key = _request_key(model, messages, temperature)
+    if LLM_CACHE:
+        content = _cache.get(key)
+        if content is not None:
+            return content
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        LLM_COALESCED.inc(model=model)
+        if not flight.done.wait(LLM_QUEUE_TIMEOUT + timeout + LLM_FALLBACK_TIMEOUT):
+            raise LLMBusy("Timed out waiting for an identical in-flight request")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        content, primary = _call(model, messages, temperature, timeout, fallback_model)
+        flight.result = content
+        if LLM_CACHE and primary and content is not None:
+            _cache.put(key, content)
+        return content
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
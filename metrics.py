@@ -0,0 +1,297 @@
+"""
+In-process latency/usage metrics exported in Prometheus text format.
+
+Kept dependency-free and cheap enough to leave on in production: an
+observation is one bisect plus a few integer/float additions under a
+per-metric lock. Each gunicorn worker keeps its own registry, so scrape
+every worker (or run one worker per container) to see the full picture.
+"""
+import os
+import time
+import bisect
+import threading
+import functools
+from contextlib import contextmanager
+
+# Seconds. Covers SQLite writes (ms) up to slow GPT-4 calls and Graph fan-outs (tens of s).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count], sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+# 📊 Metrics used across the app
+STAGE_SECONDS = Histogram(
+    "docufind_stage_duration_seconds",
+    "Time spent in a pipeline stage or external call.",
+    ("stage", "outcome"),
+)
+CHAT_SECONDS = Histogram(
+    "docufind_chat_duration_seconds",
+    "End-to-end /chat turn latency by resolved intent.",
+    ("intent", "outcome"),
+)
+HTTP_SECONDS = Histogram(
+    "docufind_http_request_duration_seconds",
+    "HTTP request latency by Flask endpoint.",
+    ("endpoint", "method", "status"),
+)
+GRAPH_REQUESTS = Counter(
+    "docufind_graph_requests_total",
+    "Microsoft Graph HTTP responses by status code.",
+    ("status",),
+)
+GRAPH_THROTTLED = Counter(
+    "docufind_graph_throttled_total",
+    "Microsoft Graph 429 responses.",
+)
+GRAPH_SCHEDULER_WAIT = Histogram(
+    "docufind_graph_scheduler_wait_seconds",
+    "Time a Graph request waited for the shared scheduler, by request class and outcome.",
+    ("request_class", "outcome"),
+)
+GRAPH_PAUSES = Counter(
+    "docufind_graph_pauses_total",
+    "Retry-After pauses applied to a Graph request class for all workers.",
+    ("request_class",),
+)
+LLM_REQUESTS = Counter(
+    "docufind_llm_requests_total",
+    "OpenAI chat completion calls.",
+    ("model", "outcome"),
+)
+LLM_TOKENS = Counter(
+    "docufind_llm_tokens_total",
+    "OpenAI token usage reported by the API.",
+    ("model", "kind"),
+)
+
+LLM_SECONDS = Histogram(
+    "docufind_llm_request_duration_seconds",
+    "OpenAI chat completion latency by model and outcome (ok, timeout, error).",
+    ("model", "outcome"),
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "docufind_llm_queue_wait_seconds",
+    "Time spent waiting for an LLM concurrency slot.",
+    ("outcome",),
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "docufind_llm_cache_lookups_total",
+    "Deterministic LLM response cache lookups by result (memory, disk, miss).",
+    ("result",),
+)
+LLM_COALESCED = Counter(
+    "docufind_llm_coalesced_total",
+    "LLM calls answered by an identical request already in flight.",
+    ("model",),
+)
+LLM_FALLBACKS = Counter(
+    "docufind_llm_fallbacks_total",
+    "LLM calls retried on the fallback model, by original model and error.",
+    ("model", "reason"),
+)
+HR_CONTEXT_TOKENS = Histogram(
+    "docufind_hr_context_tokens",
+    "Tokens of knowledge-base context sent with each HR answer prompt.",
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000),
+)
+
+SEARCH_CACHE_LOOKUPS = Counter(
+    "docufind_search_cache_lookups_total",
+    "File-search cache lookups by result (fresh, stale, miss).",
+    ("result",),
+)
+SEARCH_CACHE_GRAPH_CALLS_SAVED = Counter(
+    "docufind_search_cache_graph_calls_saved_total",
+    "Graph requests avoided by serving file searches from the cache.",
+)
+SEARCH_CACHE_REFRESHES = Counter(
+    "docufind_search_cache_refreshes_total",
+    "Background stale-while-revalidate refreshes of cached file searches, by outcome.",
+    ("outcome",),
+)
+SEARCH_CACHE_INVALIDATIONS = Counter(
+    "docufind_search_cache_invalidations_total",
+    "Per-user file-search cache invalidations (login or change of token identity).",
+)
+STATIC_RESPONSES = Counter(
+    "docufind_static_responses_total",
+    "Frontend assets answered from the static manifest, by status and content encoding.",
+    ("status", "encoding"),
+)
+STATIC_BYTES = Counter(
+    "docufind_static_bytes_total",
+    "Response body bytes sent for frontend assets, by content encoding.",
+    ("encoding",),
+)
+PROCESS_MEMORY = Gauge(
+    "docufind_process_memory_bytes",
+    "Memory of this worker process: rss, pss (shared pages split between sharers) and uss (private).",
+    ("pid", "kind"),
+)
+
+
+def process_memory(pid="self"):
+    """rss/pss/uss in bytes from /proc/<pid>/smaps_rollup (Linux); rss only elsewhere."""
+    try:
+        fields = {}
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+        return {
+            "rss": fields.get("Rss", 0),
+            "pss": fields.get("Pss", 0),
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        }
+    except OSError:
+        import sys
+        import resource
+        # ru_maxrss is the peak RSS, in bytes on macOS and kB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024}
+
+
+@contextmanager
+def timer(stage):
+    """Time a block as `stage`; outcome is "error" if it raises."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, outcome=outcome)
+
+
+def timed(stage):
+    """Decorator form of `timer`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(model, response=None, outcome="ok"):
+    """Count a chat completion and the tokens it reports (if any)."""
+    LLM_REQUESTS.inc(model=model, outcome=outcome)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+def render():
+    """All registered metrics in Prometheus text exposition format."""
+    pid = os.getpid()
+    for kind, value in process_memory().items():
+        PROCESS_MEMORY.set(value, pid=pid, kind=kind)
+
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,11 +1,8 @@
-import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from metrics import timed
+from llm_gateway import chat_completion, BUSY_REPLY
 
+@timed("detect_intent_and_extract")
 def detect_intent_and_extract(user_input):
     """
     Determine intent (file_search/general_response) and extract clean search query if needed.
@@ -28,33 +25,34 @@ def detect_intent_and_extract(user_input):
     )
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        content = chat_completion(
+            "gpt-4o",
+            [
                 {"role": "system", "content": system_prompt + user_input}
             ],
             temperature=0.1
         )
-        return json.loads(response.choices[0].message.content.strip())
+        return json.loads(content.strip())
     except Exception as e:
         print("GPT Error (intent detection):", e)
         return {"intent": "general_response", "data": ""}
 
 
+@timed("answer_general_query")
 def answer_general_query(user_input):
     """
     Use GPT to answer general (non-search) questions.
     """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        content = chat_completion(
+            "gpt-4o",
+            [
                 {"role": "system", "content": "You are a helpful assistant. Respond clearly to user questions."},
                 {"role": "user", "content": user_input}
             ],
             temperature=0.5
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
         print("GPT Error (general query):", e)
-        return "⚠️ I'm having trouble answering that. Please try again later."
+        return BUSY_REPLY
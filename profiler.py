@@ -0,0 +1,148 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+A background thread snapshots the request thread's stack every few
+milliseconds via sys._current_frames() and aggregates identical stacks.
+Output uses the folded-stack format ("a;b;c 42"), which flamegraph.pl,
+speedscope and inferno read directly. Requests that are not selected never
+start a sampler, so they pay nothing beyond the opt-in check.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_KEPT = int(os.getenv("PROFILE_MAX_KEPT", "50"))
+PROFILE_ENDPOINTS = ("chat", "upload_hr_doc")
+
+_PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Pool thread ident -> ident of the request thread it is currently working for
+_owners = {}
+
+
+def should_profile(header_value, is_admin):
+    """Admins opt in with a header; everyone else only via the sampling rate."""
+    if header_value and is_admin and header_value.lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def is_valid_profile_id(profile_id):
+    return bool(profile_id and _PROFILE_ID_RE.match(profile_id))
+
+
+@contextmanager
+def adopt(owner_thread_id):
+    """Attribute work done on this (pool) thread to `owner_thread_id`'s profile."""
+    me = threading.get_ident()
+    _owners[me] = owner_thread_id
+    try:
+        yield
+    finally:
+        _owners.pop(me, None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Samples a request thread (and pool threads adopted by it) at a fixed interval until stopped."""
+
+    def __init__(self, thread_id, interval_ms=PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.duration = time.time() - self.started
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self.thread_id and _owners.get(thread_id) != self.thread_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def save_profile(profile_id, sampler, meta):
+    """Write <id>.folded and <id>.json, then prune the oldest profiles."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    meta = dict(meta)
+    meta.update({
+        "id": profile_id,
+        "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sampler.started)),
+        "duration_ms": round(sampler.duration * 1000, 1),
+        "samples": sampler.samples,
+        "interval_ms": sampler.interval * 1000,
+    })
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    _prune()
+    return meta
+
+
+def list_profiles():
+    if not os.path.exists(PROFILE_DIR):
+        return []
+    profiles = []
+    for fname in os.listdir(PROFILE_DIR):
+        if not fname.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, fname), "r") as f:
+                profiles.append(json.load(f))
+        except Exception:
+            continue
+    return sorted(profiles, key=lambda p: p.get("started", ""), reverse=True)
+
+
+def _prune():
+    try:
+        metas = sorted(
+            (f for f in os.listdir(PROFILE_DIR) if f.endswith(".json")),
+            key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f)),
+        )
+        for fname in metas[:max(0, len(metas) - PROFILE_MAX_KEPT)]:
+            base = fname[:-len(".json")]
+            for ext in (".json", ".folded"):
+                path = os.path.join(PROFILE_DIR, base + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+    except Exception as e:
+        logging.warning(f"⚠️ Failed to prune profiles: {e}")
@@ -0,0 +1,167 @@
+"""
+Per-user cache of ranked file-search results with stale-while-revalidate.
+
+Entries are keyed by (user, normalized query). Within SEARCH_CACHE_TTL
+seconds a hit is served as-is. Until SEARCH_CACHE_STALE_TTL it is still
+served immediately, but a background refresh re-runs the Graph fan-out so
+the next lookup is fresh. A user's entries are dropped when their token
+identity (the MSAL account id) changes. The cache is per process, so each
+gunicorn worker has its own.
+"""
+import os
+import re
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import graph_scheduler
+from graph_api import counting_graph_calls
+from metrics import (
+    SEARCH_CACHE_LOOKUPS,
+    SEARCH_CACHE_GRAPH_CALLS_SAVED,
+    SEARCH_CACHE_REFRESHES,
+    SEARCH_CACHE_INVALIDATIONS,
+)
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "120"))
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_REFRESH_WORKERS = int(os.getenv("SEARCH_CACHE_REFRESH_WORKERS", "2"))
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", (query or "").strip().strip("'\"").lower())
+
+
+class _Entry:
+    __slots__ = ("results", "stored_at", "identity", "graph_calls", "refreshing")
+
+    def __init__(self, results, identity, graph_calls):
+        self.results = results
+        self.stored_at = time.monotonic()
+        self.identity = identity
+        self.graph_calls = graph_calls
+        self.refreshing = False
+
+
+class SearchCache:
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL, stale_ttl=SEARCH_CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._identities = {}
+        self._refresher = None
+
+    def _refresh_pool(self):
+        # Created lazily so threads are started in the worker, not the preloading master
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(
+                    max_workers=SEARCH_CACHE_REFRESH_WORKERS, thread_name_prefix="search-refresh")
+            return self._refresher
+
+    def _check_identity(self, user, identity):
+        """Drop the user's entries if they now search under a different identity. Caller holds the lock."""
+        previous = self._identities.get(user)
+        if previous is not None and previous != identity:
+            self._drop_user(user)
+            SEARCH_CACHE_INVALIDATIONS.inc()
+        self._identities[user] = identity
+
+    def _drop_user(self, user):
+        for key in [k for k in self._entries if k[0] == user]:
+            del self._entries[key]
+
+    def invalidate_user(self, user):
+        with self._lock:
+            self._drop_user(user)
+            self._identities.pop(user, None)
+        SEARCH_CACHE_INVALIDATIONS.inc()
+
+    def _store(self, key, identity, results, graph_calls):
+        with self._lock:
+            if self._identities.get(key[0]) != identity:
+                return  # identity changed while the search was running
+            self._entries[key] = _Entry(results, identity, graph_calls)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _search(self, search_fn, query, cancel_event=None):
+        with counting_graph_calls() as counter:
+            results = search_fn(query)
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        return results, counter["calls"], cancelled, counter["complete"]
+
+    def _refresh(self, key, identity, refresh_fn, query, cancel_event=None):
+        try:
+            with graph_scheduler.request_class("background"):
+                results, calls, cancelled, complete = self._search(refresh_fn, query, cancel_event)
+            if cancelled or not complete:
+                # A search that was told to stop, or lost part of its fan-out, may have partial results:
+                # keep serving the entry we have until it expires
+                SEARCH_CACHE_REFRESHES.inc(outcome="cancelled" if cancelled else "incomplete")
+                self._refresh_done(key)
+                return
+            self._store(key, identity, results, calls)
+            SEARCH_CACHE_REFRESHES.inc(outcome="ok")
+        except Exception as e:
+            SEARCH_CACHE_REFRESHES.inc(outcome="error")
+            logging.warning(f"⚠️ Background refresh of '{query}' failed: {e}")
+            self._refresh_done(key)
+
+    def _refresh_done(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+
+    def get_or_search(self, user, identity, query, search_fn, cancel_event=None, refresh_fn=None):
+        """
+        Return ranked results for `query`, calling search_fn(query) only on a miss.
+        Results of a cancelled or incomplete search (see counting_graph_calls) are
+        returned but never cached. Background
+        refreshes outlive the request, so they call refresh_fn(query), which must
+        not be bound to the request's cancel_event; without one, search_fn is used
+        and its result is dropped if cancel_event is set by then.
+        """
+        key = (user, normalize_query(query))
+        refresh = False
+        with self._lock:
+            self._check_identity(user, identity)
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored_at
+                if age > self.stale_ttl:
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+                    if age > self.ttl and not entry.refreshing:
+                        entry.refreshing = refresh = True
+                    results = copy.deepcopy(entry.results)
+                    saved = entry.graph_calls
+
+        if entry is not None:
+            SEARCH_CACHE_LOOKUPS.inc(result="stale" if age > self.ttl else "fresh")
+            SEARCH_CACHE_GRAPH_CALLS_SAVED.inc(saved)
+            if refresh:
+                if refresh_fn is None:
+                    self._refresh_pool().submit(self._refresh, key, identity, search_fn, query, cancel_event)
+                else:
+                    self._refresh_pool().submit(self._refresh, key, identity, refresh_fn, query)
+            return results
+
+        SEARCH_CACHE_LOOKUPS.inc(result="miss")
+        results, calls, cancelled, complete = self._search(search_fn, query, cancel_event)
+        if complete and not cancelled:
+            self._store(key, identity, copy.deepcopy(results), calls)
+        return results
+
+
+search_cache = SearchCache()
@@ -1,9 +1,12 @@
 # semantic_search.py
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+from metrics import timed
+from embedding_backend import get_sentence_model
 
-# Load only once to improve performance
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Load only once to improve performance (shared with the local embedding backend)
+model = get_sentence_model('all-MiniLM-L6-v2')
 
+@timed("rank_files")
 def rank_files_by_similarity(query, files, top_k=5):
     if not files:
         return []
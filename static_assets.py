@@ -0,0 +1,229 @@
+"""
+Static asset layer for the built React frontend (frontend/dist).
+
+At startup every file under dist is read once into an in-memory manifest
+with its content type, a strong ETag and precompressed variants: gzip, plus
+brotli when the optional `brotli` module is installed. Sidecar files a build
+step may have produced (app.js.gz, app.js.br) are used as-is.
+
+StaticAssets is WSGI middleware in front of Flask. Public assets are
+answered before Flask pushes a request context, so there is no session
+load or save, no hooks and no filesystem lookups per request:
+
+  * the variant is chosen from Accept-Encoding, with Vary: Accept-Encoding;
+  * If-None-Match is answered with 304;
+  * content-hashed files under assets/ are cached for a year as immutable,
+    and other files are revalidated with their ETag.
+
+index.html is not public: it still goes through Flask so the login
+redirect applies. The manifest is not refreshed while running, so restart
+the app after rebuilding the frontend. STATIC_MANIFEST=0 turns the layer
+off.
+"""
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+from metrics import STATIC_RESPONSES, STATIC_BYTES
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+STATIC_MANIFEST = os.getenv("STATIC_MANIFEST", "1") != "0"
+STATIC_MAX_INMEMORY_BYTES = int(os.getenv("STATIC_MAX_INMEMORY_BYTES", str(8 * 1024 * 1024)))
+STATIC_GZIP_LEVEL = int(os.getenv("STATIC_GZIP_LEVEL", "9"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+
+IMMUTABLE_PREFIX = "assets/"
+PRIVATE_FILES = ("index.html",)
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/xml", "application/wasm", "application/manifest+json")
+MIN_COMPRESS_BYTES = 512
+SIDECARS = {".gz": "gzip", ".br": "br"}
+
+
+class Asset:
+    __slots__ = ("path", "content_type", "cache_control", "etag", "variants", "disk_path", "size")
+
+    def __init__(self, path, disk_path, content_type, cache_control):
+        self.path = path
+        self.disk_path = disk_path
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = None
+        self.size = 0
+        self.variants = {}  # encoding -> bytes; "identity" missing for files served from disk
+
+
+def _compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def build_manifest(root):
+    """Map URL path (no leading slash) -> Asset for every file under root."""
+    manifest = {}
+    if not os.path.isdir(root):
+        logging.warning(f"⚠️ Static folder {root} not found; frontend assets will 404 until it is built")
+        return manifest
+
+    for dirpath, _, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            base, ext = os.path.splitext(name)
+            if ext in SIDECARS and base in names:
+                continue  # precompressed sidecar, attached to its original below
+            disk_path = os.path.join(dirpath, name)
+            path = os.path.relpath(disk_path, root).replace(os.sep, "/")
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            cache = IMMUTABLE_CACHE if path.startswith(IMMUTABLE_PREFIX) else REVALIDATE_CACHE
+            asset = Asset(path, disk_path, content_type, cache)
+            asset.size = os.path.getsize(disk_path)
+
+            if asset.size > STATIC_MAX_INMEMORY_BYTES:
+                digest = hashlib.sha256()
+                with open(disk_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(chunk)
+                asset.etag = digest.hexdigest()[:20]
+                manifest[path] = asset
+                continue
+
+            with open(disk_path, "rb") as f:
+                data = f.read()
+            asset.etag = hashlib.sha256(data).hexdigest()[:20]
+            asset.variants["identity"] = data
+
+            for suffix, encoding in SIDECARS.items():
+                if name + suffix in names:
+                    with open(disk_path + suffix, "rb") as f:
+                        asset.variants[encoding] = f.read()
+            if _compressible(content_type) and len(data) >= MIN_COMPRESS_BYTES:
+                if "gzip" not in asset.variants:
+                    asset.variants["gzip"] = gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL, mtime=0)
+                if brotli is not None and "br" not in asset.variants:
+                    asset.variants["br"] = brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+            # Only keep variants that actually save bytes
+            for encoding in [e for e in asset.variants if e != "identity"]:
+                if len(asset.variants[encoding]) >= len(data):
+                    del asset.variants[encoding]
+            manifest[path] = asset
+
+    total = sum(a.size for a in manifest.values())
+    logging.info(f"📦 Static manifest: {len(manifest)} files, {total / 1024:.0f} KB"
+                 f"{'' if brotli else ' (brotli not installed, gzip only)'}")
+    return manifest
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts with q > 0, from an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(token)
+    if "*" in accepted:
+        accepted.update(("br", "gzip"))
+    return accepted
+
+
+def choose_encoding(asset, accept_encoding):
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and encoding in accepted:
+            return encoding
+    return "identity"
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class StaticAssets:
+    """WSGI middleware serving public files of `root` from the manifest, passing everything else on."""
+
+    def __init__(self, app, root):
+        self.app = app
+        self.root = root
+        self.manifest = build_manifest(root)
+
+    def lookup(self, path_info):
+        path = path_info.encode("latin-1", "replace").decode("utf-8", "replace").lstrip("/")
+        if not path or path in PRIVATE_FILES:
+            return None
+        return self.manifest.get(path)
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") not in ("GET", "HEAD"):
+            return self.app(environ, start_response)
+        asset = self.lookup(environ.get("PATH_INFO", ""))
+        if asset is None:
+            return self.app(environ, start_response)
+
+        encoding = choose_encoding(asset, environ.get("HTTP_ACCEPT_ENCODING"))
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        headers = [
+            ("Cache-Control", asset.cache_control),
+            ("ETag", etag),
+            ("Vary", "Accept-Encoding"),
+        ]
+
+        if _etag_matches(environ.get("HTTP_IF_NONE_MATCH"), etag):
+            STATIC_RESPONSES.inc(status=304, encoding=encoding)
+            start_response("304 Not Modified", headers)
+            return []
+
+        headers.append(("Content-Type", asset.content_type))
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        body = asset.variants.get(encoding)
+        length = len(body) if body is not None else asset.size
+        headers.append(("Content-Length", str(length)))
+        STATIC_RESPONSES.inc(status=200, encoding=encoding)
+        STATIC_BYTES.inc(0 if environ["REQUEST_METHOD"] == "HEAD" else length, encoding=encoding)
+        start_response("200 OK", headers)
+
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        if body is not None:
+            return [body]
+        f = open(asset.disk_path, "rb")
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if file_wrapper:
+            return file_wrapper(f, 1024 * 1024)
+        return _iter_file(f)
+
+
+def _iter_file(f):
+    with f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            yield chunk
+
+
+def install(app):
+    """Put the asset layer in front of a Flask app's WSGI callable, unless disabled."""
+    if STATIC_MANIFEST and app.static_folder:
+        app.wsgi_app = StaticAssets(app.wsgi_app, app.static_folder)
+    return app
@@ -0,0 +1,56 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+HR_ADMIN = "hr.admin@contoso.com"
+
+
+@pytest.fixture(scope="session")
+def app_env(tmp_path_factory):
+    """
+    The Flask app imported once against the offline Graph and OpenAI stand-ins
+    (the same setup as benchmarks.load_test), with MSAL stubbed out.
+    Skips when the app's dependencies are not installed.
+    """
+    pytest.importorskip("flask")
+    from benchmarks.fakes import FakeGraphServer, FakeOpenAIServer
+    from benchmarks.load_test import prepare_environment, FakeMsalApp
+
+    workdir = str(tmp_path_factory.mktemp("app"))
+    graph = FakeGraphServer().start()
+    openai_server = FakeOpenAIServer().start()
+    cwd, environ = os.getcwd(), dict(os.environ)
+    try:
+        prepare_environment(workdir, graph, openai_server, admin_emails=[HR_ADMIN])
+        os.environ.update({
+            "GRAPH_SCHEDULER_DB": os.path.join(workdir, "graph_scheduler.db"),
+            "LLM_CACHE_DB": os.path.join(workdir, "llm_cache.db"),
+            "STATIC_MANIFEST": "0",
+        })
+        app_module = pytest.importorskip("app")
+        import graph_api
+
+        app_module.build_msal_app = FakeMsalApp
+        graph_api.build_msal_app = FakeMsalApp
+        app_module.app.config["TESTING"] = True
+        yield SimpleNamespace(module=app_module, graph=graph, openai=openai_server, workdir=workdir)
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        graph.stop()
+        openai_server.stop()
+
+
+def login(client, email, account_id="acct-1"):
+    with client.session_transaction() as sess:
+        sess["user_email"] = email
+        sess["account_id"] = account_id
+        sess["chat_id"] = "1700000000"
+        sess["stage"] = "awaiting_query"
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from conftest import login
+
+chat_pipeline = pytest.importorskip("chat_pipeline")
+
+
+def test_turn_without_a_session_starts_no_llm_stage(monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_pipeline, "classify_intent", lambda q: calls.append("classify") or "General")
+    monkeypatch.setattr(chat_pipeline, "detect_intent_and_extract", lambda q: calls.append("detect") or {})
+
+    turn = chat_pipeline.ChatTurn("find payroll", expects_file_query=True, speculate=False)
+    turn.set_token(None)
+    turn.close()
+
+    assert calls == []
+
+
+def test_anonymous_chat_makes_no_upstream_llm_call(app_env):
+    client = app_env.module.app.test_client()
+    before = app_env.openai.stats()["requests"]
+
+    res = client.post("/chat", json={"message": "find the payroll report", "chat_id": "1700000000"})
+
+    assert res.status_code == 200
+    assert res.get_json()["intent"] in ("error", "session_expired")
+    time.sleep(0.2)  # anything speculative would have reached the fake server by now
+    assert app_env.openai.stats()["requests"] == before
+
+
+def test_logged_in_chat_still_classifies(app_env):
+    client = app_env.module.app.test_client()
+    login(client, "ana@contoso.com")
+    before = app_env.openai.stats()["requests"]
+
+    res = client.post("/chat", json={"message": "hello there"})
+
+    assert res.status_code == 200
+    assert app_env.openai.stats()["requests"] > before
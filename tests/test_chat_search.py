@@ -0,0 +1,133 @@
+import sqlite3
+
+import pytest
+
+db = pytest.importorskip("db")
+
+ANA = "ana@contoso.com"
+BEN = "ben@contoso.com"
+
+
+@pytest.fixture
+def chat_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "chat_history.db"))
+    db.init_db()
+    return db.DB_NAME
+
+
+def query(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def indexed_rowids(path):
+    return sorted(r[0] for r in query(path, "SELECT rowid FROM chat_history_fts"))
+
+
+def test_results_are_limited_to_the_callers_chats(chat_db):
+    db.save_message(ANA, "100", "where is the payroll report", "In Finance/Payroll")
+    db.save_message(BEN, "200", "payroll deadline for march", "March 25th")
+
+    results = db.search_messages(ANA, "payroll")
+
+    assert [r["chat_id"] for r in results] == ["100"]
+    assert "<mark>payroll</mark>" in results[0]["user_message"]
+    assert db.search_messages("carol@contoso.com", "payroll") == []
+
+
+def test_triggers_keep_the_index_in_sync(chat_db):
+    db.save_message(ANA, "100", "quarterly budget spreadsheet", "Found budget.xlsx")
+    (row_id,) = query(chat_db, "SELECT id FROM chat_history WHERE user_message LIKE 'quarterly%'")[0]
+    assert db.search_messages(ANA, "budget")
+
+    conn = sqlite3.connect(chat_db)
+    conn.execute("UPDATE chat_history SET user_message = 'onboarding checklist' WHERE id = ?", (row_id,))
+    conn.execute("UPDATE chat_history SET ai_response = 'Found checklist.docx' WHERE id = ?", (row_id,))
+    conn.commit()
+    assert db.search_messages(ANA, "budget") == []
+    assert [r["chat_id"] for r in db.search_messages(ANA, "onboarding")] == ["100"]
+
+    conn.execute("DELETE FROM chat_history WHERE id = ?", (row_id,))
+    conn.commit()
+    conn.close()
+    assert db.search_messages(ANA, "onboarding") == []
+    assert indexed_rowids(chat_db) == []
+
+
+def test_title_rows_are_not_indexed(chat_db):
+    db.save_message(ANA, "1700000000", "hello", "Hi! How can I help?")
+
+    titles = query(chat_db, "SELECT id FROM chat_history WHERE user_message LIKE '[TITLE]%'")
+    assert len(titles) == 1
+    assert titles[0][0] not in indexed_rowids(chat_db)
+    assert db.search_messages(ANA, "Chat") == []
+
+
+def test_retention_removes_old_messages_from_the_index(chat_db):
+    conn = sqlite3.connect(chat_db)
+    conn.execute(
+        "INSERT INTO chat_history (user_email, chat_id, user_message, ai_response, timestamp) VALUES (?, ?, ?, ?, ?)",
+        (ANA, "100", "old expense policy", "See HR", "2000-01-01 00:00:00"),
+    )
+    conn.commit()
+    conn.close()
+    db.save_message(ANA, "200", "new expense policy", "See HR")
+    assert len(db.search_messages(ANA, "expense")) == 2
+
+    db.delete_old_messages(days=3)
+
+    assert [r["chat_id"] for r in db.search_messages(ANA, "expense")] == ["200"]
+    live = [r[0] for r in query(chat_db, "SELECT id FROM chat_history WHERE user_message NOT LIKE '[TITLE]%'")]
+    assert indexed_rowids(chat_db) == sorted(live)
+
+
+def test_messages_saved_before_the_index_existed_are_backfilled(monkeypatch, tmp_path):
+    path = str(tmp_path / "legacy.db")
+    monkeypatch.setattr(db, "DB_NAME", path)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_email TEXT NOT NULL, chat_id TEXT NOT NULL,
+            user_message TEXT, ai_response TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT INTO chat_history (user_email, chat_id, user_message) VALUES (?, '100', '[TITLE]Chat')", (ANA,))
+    conn.execute("INSERT INTO chat_history (user_email, chat_id, user_message) VALUES (?, '100', 'travel policy')", (ANA,))
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+
+    assert [r["chat_id"] for r in db.search_messages(ANA, "travel")] == ["100"]
+    assert indexed_rowids(path) == [2]
+
+
+@pytest.mark.parametrize("text", [
+    '") OR owner:*',
+    'payroll" OR "',
+    "owner : u*",
+    "NEAR(payroll deadline)",
+    "{user_email} : *",
+    "payroll AND NOT x",
+    "*",
+    "^payroll",
+    "'; DROP TABLE chat_history; --",
+])
+def test_fts_syntax_in_user_input_is_quoted(chat_db, text):
+    db.save_message(ANA, "100", "my payroll question", "Answered")
+    db.save_message(BEN, "200", "ben payroll owner deadline and near", "Answered")
+
+    results = db.search_messages(ANA, text)
+
+    assert all(r["chat_id"] == "100" for r in results)
+    assert query(chat_db, "SELECT COUNT(*) FROM chat_history")[0][0] == 4
+
+
+def test_input_without_words_returns_nothing(chat_db):
+    db.save_message(ANA, "100", "payroll", "ok")
+
+    assert db.search_messages(ANA, '"() :*') == []
+    assert db.build_search_query("  ") is None
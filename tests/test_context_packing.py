@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import context_packing
+from context_packing import pack_context
+
+CHUNK_CHARS = 700
+
+
+def doc(text, source, start=None):
+    return SimpleNamespace(page_content=text, metadata={"source": source, "page": 0, "start_index": start})
+
+
+def chunk_text(i):
+    return f"[leave-{i:02d}] " + ("Annual leave accrues monthly. " * 30)[:CHUNK_CHARS - 11]
+
+
+def test_adjacent_chunks_stop_merging_at_the_budget(monkeypatch):
+    monkeypatch.setattr(context_packing, "_encoding", False)  # ~4 chars/token, no tiktoken needed
+    # 12 neighbouring chunks of the most relevant document (~2100 tokens if merged)
+    scored = [(doc(chunk_text(i), "leave.docx", i * CHUNK_CHARS), 0.10 + 0.01 * i) for i in range(12)]
+    scored.append((doc("Parking permits are renewed every January at reception. " * 4, "parking.docx"), 0.5))
+
+    context, stats = pack_context(scored, token_budget=1500)
+
+    assert "[leave-00]" in context
+    assert stats["tokens"] <= 1500
+    assert stats["tokens"] > 1000
+    assert stats["merged"] > 0
+
+
+def test_merges_within_budget_are_unchanged(monkeypatch):
+    monkeypatch.setattr(context_packing, "_encoding", False)
+    scored = [(doc(chunk_text(i), "leave.docx", i * CHUNK_CHARS), 0.1 + 0.01 * i) for i in range(3)]
+
+    context, stats = pack_context(scored, token_budget=1500)
+
+    assert stats["passages"] == 1
+    assert stats["merged"] == 2
+    assert context.index("[leave-00]") < context.index("[leave-01]") < context.index("[leave-02]")
@@ -0,0 +1,116 @@
+import sys
+import time
+import types
+import threading
+import importlib
+import importlib.util
+
+import pytest
+
+if importlib.util.find_spec("requests") is not None:
+    graph_scheduler = importlib.import_module("graph_scheduler")
+else:
+    # Only busy_response needs requests; load the scheduler without it
+    sys.modules["requests"] = types.ModuleType("requests")
+    try:
+        graph_scheduler = importlib.import_module("graph_scheduler")
+    finally:
+        del sys.modules["requests"]
+
+
+@pytest.fixture
+def sched(monkeypatch, tmp_path):
+    monkeypatch.setattr(graph_scheduler, "GRAPH_SCHEDULER", True)
+    monkeypatch.setattr(graph_scheduler, "GRAPH_SCHEDULER_DB", str(tmp_path / "graph_scheduler.db"))
+    monkeypatch.setattr(graph_scheduler, "_local", threading.local())
+    monkeypatch.setattr(graph_scheduler, "GRAPH_RATE_PER_SEC", 1000.0)
+    monkeypatch.setattr(graph_scheduler, "GRAPH_BURST", 1000.0)
+    monkeypatch.setattr(graph_scheduler, "GRAPH_MAX_CONCURRENCY", 100)
+    monkeypatch.setattr(graph_scheduler, "GRAPH_INTERACTIVE_RESERVE", 0.25)
+    monkeypatch.setattr(graph_scheduler, "GRAPH_LEASE_SECONDS", 60.0)
+    monkeypatch.setattr(graph_scheduler, "CLASS_CONCURRENCY", {"interactive": 100, "background": 100, "email": 100})
+    return graph_scheduler
+
+
+def acquire(sched, cls, now=None):
+    lease, _ = sched._try_acquire(sched._connect(), cls, time.time() if now is None else now)
+    return lease
+
+
+def test_pause_holds_back_the_class_and_lower_ones_only(sched):
+    sched.pause("background", 30)
+
+    assert acquire(sched, "background") is None
+    assert acquire(sched, "email") is None
+    assert acquire(sched, "interactive") is not None
+
+
+def test_interactive_pause_holds_back_everyone(sched):
+    sched.pause("interactive", 30)
+
+    assert all(acquire(sched, cls) is None for cls in sched.PRIORITY)
+
+
+def test_bucket_reserve_is_left_for_interactive(sched, monkeypatch):
+    monkeypatch.setattr(sched, "GRAPH_RATE_PER_SEC", 0.001)
+    monkeypatch.setattr(sched, "GRAPH_BURST", 4.0)  # reserve: the last 1 token
+    now = time.time()
+
+    granted = [acquire(sched, "background", now) for _ in range(4)]
+    assert [g is not None for g in granted] == [True, True, True, False]
+    assert acquire(sched, "email", now) is None
+    assert acquire(sched, "interactive", now) is not None
+    assert acquire(sched, "interactive", now) is None  # bucket empty
+
+
+def test_concurrency_reserve_is_left_for_interactive(sched, monkeypatch):
+    monkeypatch.setattr(sched, "GRAPH_MAX_CONCURRENCY", 4)  # lower classes may hold 3
+
+    granted = [acquire(sched, "background") for _ in range(4)]
+    assert [g is not None for g in granted] == [True, True, True, False]
+    assert acquire(sched, "interactive") is not None
+    assert acquire(sched, "interactive") is None  # global cap reached
+
+
+def test_per_class_concurrency_cap(sched, monkeypatch):
+    monkeypatch.setitem(sched.CLASS_CONCURRENCY, "email", 2)
+
+    assert acquire(sched, "email") is not None
+    assert acquire(sched, "email") is not None
+    assert acquire(sched, "email") is None
+    assert acquire(sched, "background") is not None
+
+
+def test_expired_leases_are_reclaimed(sched, monkeypatch):
+    monkeypatch.setattr(sched, "GRAPH_MAX_CONCURRENCY", 1)
+    now = time.time()
+
+    assert acquire(sched, "interactive", now) is not None  # never released, e.g. a crashed worker
+    assert acquire(sched, "interactive", now + 1) is None
+    assert acquire(sched, "interactive", now + sched.GRAPH_LEASE_SECONDS + 1) is not None
+
+
+def test_slot_releases_its_lease(sched, monkeypatch):
+    monkeypatch.setattr(sched, "GRAPH_MAX_CONCURRENCY", 1)
+
+    with sched.slot("interactive", max_wait=1) as granted:
+        assert granted
+    with sched.slot("interactive", max_wait=1) as granted:
+        assert granted
+
+
+def test_slot_gives_up_after_max_wait(sched):
+    sched.pause("interactive", 30)
+
+    start = time.monotonic()
+    with sched.slot("interactive", max_wait=0.2) as granted:
+        assert granted is False
+    assert 0.2 <= time.monotonic() - start < 2
+
+
+def test_disabled_scheduler_always_grants(sched, monkeypatch):
+    sched.pause("interactive", 30)
+    monkeypatch.setattr(sched, "GRAPH_SCHEDULER", False)
+
+    with sched.slot("interactive", max_wait=0) as granted:
+        assert granted
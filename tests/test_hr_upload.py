@@ -0,0 +1,124 @@
+import io
+import os
+import shutil
+import zipfile
+
+import pytest
+
+from conftest import HR_ADMIN, login
+
+
+@pytest.fixture
+def upload(app_env, monkeypatch):
+    """POST files to /upload_hr_docs as an HR admin against an empty document store, with indexing stubbed."""
+    app_module = app_env.module
+    shutil.rmtree(app_module.DOCS_DIR, ignore_errors=True)
+    if os.path.exists(app_module.METADATA_PATH):
+        os.remove(app_module.METADATA_PATH)
+    builds = []
+    monkeypatch.setattr(app_module, "build_index", lambda: builds.append(1))
+    client = app_module.app.test_client()
+    login(client, HR_ADMIN)
+
+    def post(*files):
+        res = client.post(
+            "/upload_hr_docs",
+            data={"files": [(io.BytesIO(content), name) for name, content in files]},
+            content_type="multipart/form-data",
+        )
+        res.builds = len(builds)
+        return res
+
+    return post
+
+
+def make_zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            if content is None:
+                archive.writestr(zipfile.ZipInfo(name), b"")  # directory entry
+            else:
+                archive.writestr(name, content)
+    return buf.getvalue()
+
+
+def reasons(entries):
+    return {e["name"]: e["reason"] for e in entries}
+
+
+def test_summary_lists_added_skipped_and_failed(upload, app_env):
+    res = upload(("policy.txt", b"leave policy"), ("notes.exe", b"MZ"))
+
+    body = res.get_json()
+    assert res.status_code == 200
+    assert body["added"] == ["policy.txt"]
+    assert body["skipped"] == []
+    assert reasons(body["failed"]) == {"notes.exe": "Unsupported format"}
+    assert body["message"].startswith("✅ 1 added, 0 skipped, 1 failed")
+    assert res.builds == 1
+    assert os.path.isfile(os.path.join(app_env.module.DOCS_DIR, "policy.txt"))
+    assert app_env.module.load_metadata()["policy.txt"]["uploader"] == HR_ADMIN
+
+
+def test_same_content_twice_in_one_batch_is_added_once(upload):
+    body = upload(("a.txt", b"same"), ("b.txt", b"same")).get_json()
+
+    assert body["added"] == ["a.txt"]
+    assert reasons(body["skipped"]) == {"b.txt": "Same content as 'a.txt'"}
+
+
+def test_content_already_on_disk_is_skipped_without_reindexing(upload):
+    upload(("handbook.txt", b"handbook v1"))
+
+    res = upload(("handbook-copy.txt", b"handbook v1"))
+
+    body = res.get_json()
+    assert body["added"] == []
+    assert reasons(body["skipped"]) == {"handbook-copy.txt": "Same content as 'handbook.txt'"}
+    assert body["message"].startswith("ℹ️ Nothing new to index")
+    assert res.builds == 1  # only the first upload reindexed
+
+
+def test_file_over_the_per_file_limit_fails(upload, app_env, monkeypatch):
+    monkeypatch.setattr(app_env.module, "HR_UPLOAD_MAX_FILE_MB", 1)
+    body = upload(("big.txt", b"x" * (1024 * 1024 + 1)), ("small.txt", b"ok")).get_json()
+
+    assert body["added"] == ["small.txt"]
+    assert reasons(body["failed"]) == {"big.txt": "File larger than 1 MB"}
+    assert not os.path.exists(os.path.join(app_env.module.DOCS_DIR, "big.txt"))
+
+
+def test_batch_limit_applies_to_expanded_zip_contents(upload, app_env, monkeypatch):
+    mb = 1024 * 1024
+    monkeypatch.setattr(app_env.module, "HR_UPLOAD_MAX_FILE_MB", 1)
+    monkeypatch.setattr(app_env.module, "HR_UPLOAD_MAX_BATCH_MB", 2)
+    archive = make_zip([("one.txt", b"1" * (mb - 10)), ("two.txt", b"2" * (mb - 10)), ("three.txt", b"3" * (mb - 10))])
+
+    body = upload(("docs.zip", archive)).get_json()
+
+    assert body["added"] == ["one.txt", "two.txt"]
+    assert reasons(body["failed"]) == {"three.txt": "Upload exceeds 2 MB in total"}
+
+
+def test_request_body_over_the_batch_limit_is_rejected(upload, app_env, monkeypatch):
+    monkeypatch.setattr(app_env.module, "HR_UPLOAD_MAX_BATCH_MB", 1)
+    res = upload(("big.txt", b"x" * (2 * 1024 * 1024)))
+
+    assert res.status_code == 413
+    assert res.builds == 0
+
+
+def test_zip_is_expanded_skipping_macosx_and_directories(upload):
+    archive = make_zip([
+        ("policies/", None),
+        ("policies/leave.txt", b"leave"),
+        ("policies/travel.docx", b"travel"),
+        ("__MACOSX/policies/._leave.txt", b"resource fork"),
+        ("policies/logo.png", b"png"),
+    ])
+
+    body = upload(("policies.zip", archive), ("broken.zip", b"not a zip")).get_json()
+
+    assert sorted(body["added"]) == ["leave.txt", "travel.docx"]
+    assert reasons(body["failed"]) == {"logo.png": "Unsupported format", "broken.zip": "Invalid ZIP archive"}
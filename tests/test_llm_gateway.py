@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+openai = pytest.importorskip("openai")
+llm_gateway = pytest.importorskip("llm_gateway")
+
+from benchmarks.fakes import FakeOpenAIServer
+
+CLASSIFY = [
+    {"role": "system", "content": "Classify the user query as one of: HR_Admin, File_Operation, Email_Operation, General."},
+    {"role": "user", "content": "how many days of annual leave do I get?"},
+]
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    server = FakeOpenAIServer(latency_ms=200).start()
+    client = openai.OpenAI(base_url=f"{server.base_url}/v1", api_key="sk-test", max_retries=0)
+    monkeypatch.setattr(llm_gateway, "_client", client)
+    monkeypatch.setattr(llm_gateway, "_cache", llm_gateway.ResponseCache(db_path=str(tmp_path / "llm_cache.db")))
+    monkeypatch.setattr(llm_gateway, "_slots", threading.BoundedSemaphore(8))
+    monkeypatch.setattr(llm_gateway, "LLM_CACHE", True)
+    yield server
+    server.stop()
+
+
+def upstream(server):
+    return server.stats()["requests"]
+
+
+def concurrently(n, fn):
+    barrier = threading.Barrier(n)
+
+    def run(_):
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(run, range(n)))
+
+
+def test_temperature_zero_answers_are_cached_in_memory_and_on_disk(server, tmp_path):
+    assert llm_gateway.chat_completion("gpt-4", CLASSIFY) == "HR_Admin"
+    assert llm_gateway.chat_completion("gpt-4", CLASSIFY) == "HR_Admin"
+    assert upstream(server) == 1
+
+    # Another worker: empty LRU, same SQLite file
+    llm_gateway._cache = llm_gateway.ResponseCache(db_path=str(tmp_path / "llm_cache.db"))
+    assert llm_gateway.chat_completion("gpt-4", CLASSIFY) == "HR_Admin"
+    assert upstream(server) == 1
+
+
+def test_identical_cacheable_calls_share_one_upstream_request(server, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_CACHE", False)  # only single-flight can save calls
+    results = concurrently(8, lambda: llm_gateway.chat_completion("gpt-4", CLASSIFY))
+    assert results == ["HR_Admin"] * 8
+    assert upstream(server) == 1
+
+
+def test_sampled_calls_are_never_coalesced(server):
+    messages = [{"role": "user", "content": "tell me a story"}]
+    concurrently(4, lambda: llm_gateway.chat_completion("gpt-4o", messages, temperature=0.5))
+    assert upstream(server) == 4
+
+
+def test_timeout_falls_back_and_the_fallback_answer_is_not_cached(server):
+    server.model_latency_ms = {"gpt-4": 3000}
+    assert llm_gateway.chat_completion("gpt-4", CLASSIFY, timeout=0.5, fallback_model="gpt-4o-mini") == "HR_Admin"
+    assert upstream(server) == 2
+    assert llm_gateway._cache.get(llm_gateway._request_key("gpt-4", CLASSIFY, 0)) is None
+
+
+def test_timeout_without_fallback_raises(server):
+    server.model_latency_ms = {"gpt-4": 3000}
+    with pytest.raises(openai.APITimeoutError):
+        llm_gateway.chat_completion("gpt-4", CLASSIFY, timeout=0.5, fallback_model=None)
+
+
+def test_no_free_slot_raises_llm_busy(server, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(llm_gateway, "LLM_QUEUE_TIMEOUT", 0.05)
+    llm_gateway._slots.acquire()
+    try:
+        with pytest.raises(llm_gateway.LLMBusy):
+            llm_gateway.chat_completion("gpt-4", CLASSIFY)
+    finally:
+        llm_gateway._slots.release()
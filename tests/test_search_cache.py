@@ -0,0 +1,123 @@
+import time
+import threading
+
+import pytest
+
+search_cache_module = pytest.importorskip("search_cache")
+chat_pipeline = pytest.importorskip("chat_pipeline")
+
+PAYROLL = [{"name": "payroll.docx"}]
+
+
+def wait_for_refresh(cache, key, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = cache._entries.get(key)
+        if entry is not None and not entry.refreshing:
+            return
+        time.sleep(0.01)
+    raise AssertionError("background refresh did not finish")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # ttl=0: every hit after the first search is stale and starts a background refresh
+    cache = search_cache_module.SearchCache(max_entries=10, ttl=0, stale_ttl=60)
+    monkeypatch.setattr(chat_pipeline, "search_cache", cache)
+    return cache
+
+
+def test_refresh_after_turn_close_keeps_results(cache, monkeypatch):
+    gate = threading.Event()
+
+    def fake_search_all_files(token, query, cancel_event=None):
+        if threading.current_thread().name.startswith("search-refresh"):
+            gate.wait(5)  # let the turn close before the refresh runs
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+        return [dict(f) for f in PAYROLL]
+
+    monkeypatch.setattr(chat_pipeline, "search_all_files", fake_search_all_files)
+    monkeypatch.setattr(chat_pipeline, "classify_intent", lambda q: "File_Operation")
+    monkeypatch.setattr(chat_pipeline, "detect_intent_and_extract", lambda q: {"intent": "file_search", "data": "payroll"})
+
+    def lookup():
+        # Speculative path: the search is bound to the turn's cancel event, which close() sets
+        turn = chat_pipeline.ChatTurn("find payroll", expects_file_query=True)
+        turn.set_token("token", "ana@contoso.com", "acct-1")
+        assert turn.file_intent()["data"] == "payroll"
+        try:
+            return turn.search_files("token", "payroll")
+        finally:
+            turn.close()
+
+    assert lookup() == PAYROLL  # miss
+    assert lookup() == PAYROLL  # stale hit; refresh waits until that turn is closed
+    gate.set()
+    wait_for_refresh(cache, ("ana@contoso.com", "payroll"))
+    cache.ttl = 60
+    assert lookup() == PAYROLL
+
+
+def test_cancelled_refresh_is_not_stored(cache):
+    cancelled = threading.Event()
+
+    def search(query):
+        return [] if cancelled.is_set() else [dict(f) for f in PAYROLL]
+
+    assert cache.get_or_search("ana@contoso.com", "acct-1", "payroll", search, cancel_event=cancelled) == PAYROLL
+    cancelled.set()
+    # Stale hit without a refresh_fn: the refresh reuses search, whose cancel event is now set
+    assert cache.get_or_search("ana@contoso.com", "acct-1", "payroll", search, cancel_event=cancelled) == PAYROLL
+    wait_for_refresh(cache, ("ana@contoso.com", "payroll"))
+    cache.ttl = 60
+    assert cache.get_or_search("ana@contoso.com", "acct-1", "payroll", search) == PAYROLL
+
+
+class FakeResponse:
+    def __init__(self, status_code, value=None):
+        self.status_code = status_code
+        self._value = value or []
+
+    def json(self):
+        return {"value": self._value}
+
+
+def test_throttled_search_is_not_cached_and_the_repeat_goes_back_to_graph(cache, monkeypatch):
+    graph_api = pytest.importorskip("graph_api")
+    requested = []
+    throttled = {"sites": True}
+
+    def fake_retry_request(url, headers, **kwargs):
+        requested.append(url)
+        if url.endswith("/sites?search=*"):
+            if throttled["sites"]:
+                return FakeResponse(429)
+            return FakeResponse(200, [{"id": "site-1"}])
+        if url.endswith("/sites/site-1/drives"):
+            return FakeResponse(200, [{"id": "drive-1"}])
+        if "/drives/drive-1/search" in url:
+            return FakeResponse(200, [{"name": "payroll.docx"}])
+        if url.endswith("/me/drive/recent"):
+            return FakeResponse(200, [{"name": "holiday-photos.zip"}])
+        return FakeResponse(200, [])  # personal OneDrive search: nothing
+
+    monkeypatch.setattr(graph_api, "retry_request", fake_retry_request)
+    monkeypatch.setattr(graph_api, "rank_files_by_similarity", lambda query, files, top_k=5: files[:top_k])
+    cache.ttl = 60
+
+    def lookup():
+        return cache.get_or_search("ana@contoso.com", "acct-1", "payroll",
+                                   lambda q: graph_api.search_all_files("token", q))
+
+    # Throttled sites listing: the fan-out falls back to recent files, which must not be cached
+    assert [f["name"] for f in lookup()] == ["holiday-photos.zip"]
+    calls_after_failure = len(requested)
+
+    throttled["sites"] = False
+    assert [f["name"] for f in lookup()] == ["payroll.docx"]
+    assert len(requested) > calls_after_failure
+
+    calls_after_success = len(requested)
+    assert [f["name"] for f in lookup()] == ["payroll.docx"]
+    assert len(requested) == calls_after_success